@@ -0,0 +1,218 @@
+"""asyncio version of the Bittrex client, requires aiohttp.
+
+AsyncBittrex has the same methods as Bittrex, they return coroutines:
+
+	async with AsyncBittrex() as b:
+		summaries = await asyncio.gather(*[b.market_summary(m) for m in markets])
+
+The iter_ methods are async generators:
+
+	async for order in b.iter_order_history(cursor=cursor):
+		reconcile(order)
+"""
+import asyncio
+import heapq
+import io
+import itertools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import aiohttp
+
+import decoders
+import ratelimit
+import records
+from orderbook import OrderBook
+from bittrex import log, Bittrex, BatchResult, RequestError, ResponseError, BASE, BASE_2, PRIORITY
+
+
+class AsyncBittrex(Bittrex):
+
+	def __init__(self, key=None, secret=None, session=None, timeout=10,
+				limit=100, limit_per_host=0, concurrency=20, rate_limits=None, scheduler=None,
+				decoder=None, book_source=None, nonce='uuid', numeric='float', typed=False, base=BASE, base_2=BASE_2):
+		"""
+		limit and limit_per_host size the shared aiohttp connection pool,
+		concurrency is the maximum number of requests in flight at once.
+		"""
+		self.limit = limit
+		self.limit_per_host = limit_per_host
+		self.concurrency = concurrency
+		self._semaphore = None
+		# group -> heap of (priority, order, future) waiting for the scheduler, and the task feeding them
+		self._waiting = {}
+		self._feeders = {}
+		self._order = itertools.count()
+
+		super(AsyncBittrex, self).__init__(key, secret, session=session, timeout=timeout,
+											rate_limits=rate_limits, scheduler=scheduler,
+											decoder=decoder, book_source=book_source, nonce=nonce,
+											numeric=numeric, typed=typed, base=base, base_2=base_2)
+
+	def create_session(self, *args):
+		# aiohttp sessions have to be created inside the event loop, see get_session
+		return None
+
+	def get_session(self):
+		if self.session is None or self.session.closed:
+			connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host)
+			self.session = aiohttp.ClientSession(	connector=connector,
+													timeout=aiohttp.ClientTimeout(total=self.timeout))
+		return self.session
+
+	async def close(self):
+		if self.session is not None:
+			await self.session.close()
+		if self._executor is not None:
+			self._executor.shutdown(wait=False)
+			self._executor = None
+
+	async def __aenter__(self):
+		return self
+
+	async def __aexit__(self, *exc):
+		await self.close()
+
+	async def read(self, url, headers):
+		"""Body of a successful response"""
+		if self._semaphore is None:
+			self._semaphore = asyncio.Semaphore(self.concurrency)
+
+		if log.isEnabledFor(logging.DEBUG):
+			log.debug('GET %s', url, extra={'url': url})
+
+		async with self._semaphore:
+			async with self.get_session().get(url, headers=headers) as r:
+				if not r.status == 200:
+					raise RequestError(r.status, url)
+
+				return await r.read()
+
+	async def request(self, url, headers):
+		return self.result(url, self.decode(await self.read(url, headers)))
+
+	def _items(self, url, body):
+		try:
+			for item in decoders.iter_result(io.BytesIO(body), self.decode, self.numeric):
+				yield item
+		except decoders.Unsuccessful as e:
+			raise ResponseError(url, e.message)
+
+	async def stream(self, url, headers):
+		"""Yield the result items of a request.
+
+		The body is read whole, items are decoded from it as they are taken.
+		"""
+		for item in self._items(url, await self.read(url, headers)):
+			yield item
+
+	async def batch(self, method, markets, *args, **kwargs):
+		markets = list(markets)
+		responses = await asyncio.gather(*[method(market, *args, **kwargs) for market in markets],
+										return_exceptions=True)
+
+		results = BatchResult()
+		for market, response in zip(markets, responses):
+			if isinstance(response, (RequestError, ResponseError, aiohttp.ClientError, asyncio.TimeoutError)):
+				results.errors[market] = response
+			elif isinstance(response, BaseException):
+				raise response
+			else:
+				results[market] = response
+
+		return results
+
+	async def acquire(self, group, priority):
+		if not self.scheduler.throttles(group):
+			return
+
+		future = asyncio.get_running_loop().create_future()
+		heapq.heappush(self._waiting.setdefault(group, []), (priority, next(self._order), future))
+
+		feeder = self._feeders.get(group)
+		if feeder is None or feeder.done():
+			self._feeders[group] = asyncio.ensure_future(self._feed(group))
+		await future
+
+	async def _feed(self, group):
+		"""Take the tokens of group one at a time and hand each to the most urgent waiting request"""
+		loop = asyncio.get_running_loop()
+		waiting = self._waiting[group]
+		if self._executor is None:
+			self._executor = ThreadPoolExecutor(max_workers=self.concurrency)
+
+		while waiting:
+			# Scheduler.acquire blocks, it runs in a thread for the request at the head of the queue
+			await loop.run_in_executor(self._executor, self.scheduler.acquire, group, waiting[0][0])
+			while waiting:
+				future = heapq.heappop(waiting)[2]
+				if not future.done():
+					future.set_result(None)
+					break
+
+	async def get(self, request_type, **kwargs):
+		await self.acquire(self.group(request_type), PRIORITY.get(request_type, ratelimit.NORMAL))
+		url, headers = self.prepare(request_type, **kwargs)
+		result = await self.request(url, headers)
+
+		if self.typed:
+			return records.convert(records.TYPES.get(request_type), result)
+		return result
+
+	async def get2(self, domain, group, method, **kwargs):
+		await self.acquire(domain, PRIORITY.get(method, ratelimit.NORMAL))
+		url, headers = self.prepare2(domain, group, method, **kwargs)
+		return await self.request(url, headers)
+
+	async def iter_get(self, request_type, **kwargs):
+		await self.acquire(self.group(request_type), PRIORITY.get(request_type, ratelimit.NORMAL))
+		async for item in self.stream(*self.prepare(request_type, **kwargs)):
+			yield item
+
+	async def iter_get2(self, domain, group, method, **kwargs):
+		await self.acquire(domain, PRIORITY.get(method, ratelimit.NORMAL))
+		async for item in self.stream(*self.prepare2(domain, group, method, **kwargs)):
+			yield item
+
+	async def iter_history(self, request_type, cursor=None, **kwargs):
+		# iter_order_history, iter_deposit_history and iter_withdrawl_history come through here
+		await self.acquire(self.group(request_type), PRIORITY.get(request_type, ratelimit.NORMAL))
+		url, headers = self.prepare(request_type, **kwargs)
+		records = self._items(url, await self.read(url, headers))
+		if cursor is not None:
+			records = cursor.new(request_type, records, **kwargs)
+		for record in records:
+			yield record
+
+	async def GetTicks(self, marketName, tickInterval, timeStamp=None, convertDatetime=False, columnar=False):
+		if timeStamp is None:
+			timeStamp = int(time.time() * 1000)
+
+		data = await self.get2('pub', 'market', 'GetTicks',
+								marketName=marketName, tickInterval=tickInterval, _=str(timeStamp))
+
+		return self.translate_ticks(data, convertDatetime, columnar)
+
+	async def GetLatestTick(self, marketName, tickInterval, convertDatetime=False, columnar=False):
+		data = await self.get2('pub', 'market', 'GetLatestTick',
+								marketName=marketName, tickInterval=tickInterval, _=str(int(time.time() * 1000)))
+
+		return self.translate_ticks(data, convertDatetime, columnar)
+
+	async def local_order_book(self, market, depth=50):
+		if self.book_source is None:
+			raise ValueError('local_order_book needs a book_source to keep the book current, e.g. a streaming.MarketStream')
+
+		book = self.books.get(market)
+		if book is None:
+			snapshot = await self.order_book(market, 'both', depth=depth)
+			# Another task may have seeded it meanwhile
+			book = self.books.get(market)
+			if book is None:
+				book = self.books[market] = OrderBook(market, self.book_source)
+				book.seed(snapshot)
+		return book.sync()
+
+	async def summary_table(self):
+		return records.SummaryTable(await self.market_summaries())
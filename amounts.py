@@ -0,0 +1,150 @@
+"""Exact amounts for prices and quantities.
+
+Bittrex amounts have at most 8 decimals. With numeric='decimal' a client
+decodes every JSON number with a fraction straight into a Decimal, with
+numeric='fixed' into a Fixed, an int counting units of 1e-8:
+
+	>>> Fixed('0.00000820')
+	Fixed('0.00000820')
+	>>> int(Fixed('0.00000820'))
+	820
+
+The conversion happens in the JSON parser through its parse_float hook, the
+decoded data is never walked a second time. Numbers without a fraction stay
+ints, they are counts and ids rather than amounts.
+
+format_amount writes any of these types, and floats, as a plain decimal for
+the query string of an order.
+"""
+import functools
+import json
+import operator
+from decimal import Decimal, ROUND_HALF_EVEN
+
+PLACES = 8
+SCALE = 10 ** PLACES
+
+MODES = ('float', 'decimal', 'fixed')
+
+
+def _units(other):
+	"""other in units of 1e-8 for arithmetic with a Fixed, NotImplemented for other types"""
+	if isinstance(other, Fixed):
+		return int(other)
+	if isinstance(other, (float, Decimal)):
+		return int(Fixed(other))
+	if isinstance(other, int):
+		if other == 0:
+			return 0
+		raise TypeError('Fixed amounts don\'t mix with the bare int %r, it could be units or whole coins, '
+						'use Fixed(Decimal(%r)) or Fixed(units)' % (other, other))
+	return NotImplemented
+
+
+def _compare(op):
+	def compare(self, other):
+		units = _units(other)
+		if units is NotImplemented:
+			return NotImplemented
+		return op(int(self), units)
+	return compare
+
+
+class Fixed(int):
+	"""Amount as an int of 1e-8 units.
+
+	Strings, Decimals and floats are read as amounts and rounded to 8
+	decimals, ints are taken as units. Adding, subtracting and ordering
+	converts floats and Decimals as amounts and refuses bare ints other than
+	0, a 5 could be units or whole coins. Sums and differences are Fixed,
+	other arithmetic gives plain ints in units. With a float or Decimal on
+	the left Python never asks the Fixed, keep the Fixed first.
+	"""
+	__slots__ = ()
+
+	def __new__(cls, value=0):
+		if isinstance(value, (str, bytes)):
+			value = _parse(value.decode() if isinstance(value, bytes) else value)
+		elif isinstance(value, Decimal):
+			value = int(value.scaleb(PLACES).to_integral_value(ROUND_HALF_EVEN))
+		elif isinstance(value, float):
+			value = int(round(value * SCALE))
+		return super(Fixed, cls).__new__(cls, value)
+
+	def __add__(self, other):
+		units = _units(other)
+		if units is NotImplemented:
+			return NotImplemented
+		return int.__new__(Fixed, int(self) + units)
+
+	__radd__ = __add__
+
+	def __sub__(self, other):
+		units = _units(other)
+		if units is NotImplemented:
+			return NotImplemented
+		return int.__new__(Fixed, int(self) - units)
+
+	def __rsub__(self, other):
+		units = _units(other)
+		if units is NotImplemented:
+			return NotImplemented
+		return int.__new__(Fixed, units - int(self))
+
+	__lt__ = _compare(operator.lt)
+	__le__ = _compare(operator.le)
+	__gt__ = _compare(operator.gt)
+	__ge__ = _compare(operator.ge)
+
+	def __str__(self):
+		whole, fraction = divmod(abs(int(self)), SCALE)
+		return '%s%d.%08d' % ('-' if self < 0 else '', whole, fraction)
+
+	def __repr__(self):
+		return 'Fixed(%r)' % str(self)
+
+	def __float__(self):
+		return int(self) / float(SCALE)
+
+	def to_decimal(self):
+		return Decimal(int(self)).scaleb(-PLACES)
+
+
+def _parse(text):
+	whole, _, fraction = text.strip().partition('.')
+	if len(fraction) <= PLACES:
+		try:
+			# int() takes the sign and leading zeros, and rejects exponents
+			return int(whole + fraction.ljust(PLACES, '0'))
+		except ValueError:
+			pass
+	return int(Decimal(text).scaleb(PLACES).to_integral_value(ROUND_HALF_EVEN))
+
+
+def parse_fixed(text):
+	"""parse_float hook of the fixed mode"""
+	return int.__new__(Fixed, _parse(text))
+
+
+def loads(numeric):
+	"""json.loads decoding numbers with a fraction as float, Decimal or Fixed"""
+	if numeric == 'decimal':
+		return functools.partial(json.loads, parse_float=Decimal)
+	if numeric == 'fixed':
+		return functools.partial(json.loads, parse_float=parse_fixed)
+	if numeric == 'float':
+		return json.loads
+	raise ValueError('Unknown numeric mode %r, choose from %s' % (numeric, ', '.join(MODES)))
+
+
+def format_amount(value):
+	"""value as a plain decimal string, without exponent or rounding"""
+	if isinstance(value, Fixed):
+		return str(value)
+	if isinstance(value, Decimal):
+		return format(value, 'f')
+	if isinstance(value, float):
+		text = repr(value)
+		# repr is the shortest exact form, it only needs expanding when it has an exponent
+		return format(Decimal(text), 'f') if 'e' in text else text
+	return value
@@ -0,0 +1,136 @@
+"""Backfill the candle store for many markets in parallel.
+
+	python backfill.py --root candles --interval oneMin --workers 8 --rate 5
+
+Markets are synced into a candlestore.CandleStore by a pool of workers within
+a request rate budget. Every finished market is written to a checkpoint
+file, so an interrupted run picks up where it stopped. The checkpoint is
+removed once every market is done, the next run is a full refresh again.
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+
+import ratelimit
+from bittrex import Bittrex, BatchResult, RequestError, ResponseError
+from candlestore import CandleStore
+
+log = logging.getLogger(__name__)
+
+
+class Progress(object):
+	__slots__ = ('done', 'total', 'failed', 'candles', 'elapsed')
+
+	def __init__(self, done, total, failed, candles, elapsed):
+		self.done = done
+		self.total = total
+		self.failed = failed
+		self.candles = candles
+		self.elapsed = elapsed
+
+	def __str__(self):
+		elapsed = max(self.elapsed, 1e-9)
+		return '%d/%d markets, %d failed, %d candles, %.2f markets/s, %.0f candles/s' % (
+			self.done, self.total, self.failed, self.candles, self.done / elapsed, self.candles / elapsed)
+
+
+class Backfill(object):
+	def __init__(self, client, store, interval='oneMin', workers=4, rate=None, checkpoint=None, report=None):
+		"""
+		rate is the budget in GetTicks requests per second of this backfill,
+		on top of the limits of the client's own scheduler, which is left as
+		it is. report is called with a Progress after every market, progress
+		is logged when it isn't given.
+		"""
+		self.client = client
+		self.store = store
+		self.interval = interval
+		self.workers = workers
+		self.checkpoint = checkpoint or os.path.join(store.root, interval + '.checkpoint.json')
+		self.report = report or (lambda progress: log.info('%s', progress))
+
+		# sync_ticks sends one GetTicks request per market
+		self.scheduler = ratelimit.Scheduler({'ticks': rate} if rate is not None else None)
+
+	def load_checkpoint(self):
+		if not os.path.exists(self.checkpoint):
+			return set()
+		with open(self.checkpoint) as f:
+			return set(json.load(f)['done'])
+
+	def save_checkpoint(self, done):
+		directory = os.path.dirname(self.checkpoint)
+		if directory and not os.path.isdir(directory):
+			os.makedirs(directory)
+
+		tmp = self.checkpoint + '.tmp'
+		with open(tmp, 'w') as f:
+			json.dump({'interval': self.interval, 'done': sorted(done)}, f)
+		os.replace(tmp, self.checkpoint)
+
+	def markets(self):
+		return [m['MarketName'] for m in self.client.markets()]
+
+	def sync(self, market):
+		self.scheduler.acquire('ticks')
+		return self.store.sync_ticks(market, self.interval)
+
+	def run(self, markets=None):
+		"""Sync every market not done yet, returns a BatchResult of candles written per market"""
+		if markets is None:
+			markets = self.markets()
+
+		done = self.load_checkpoint()
+		todo = [m for m in markets if m not in done]
+		if done:
+			log.info('Resuming backfill, %d of %d markets done before', len(markets) - len(todo), len(markets))
+
+		results = BatchResult()
+		start = time.time()
+		candles = 0
+
+		with ThreadPoolExecutor(max_workers=self.workers) as executor:
+			futures = dict((executor.submit(self.sync, market), market) for market in todo)
+
+			for future in as_completed(futures):
+				market = futures[future]
+				try:
+					results[market] = future.result()
+				except (RequestError, ResponseError, requests.RequestException) as e:
+					log.warning('Backfill of %s failed: %s', market, e)
+					results.errors[market] = e
+				else:
+					candles += results[market]
+					done.add(market)
+					self.save_checkpoint(done)
+
+				self.report(Progress(len(results) + len(results.errors), len(todo), len(results.errors),
+										candles, time.time() - start))
+
+		if not results.errors and os.path.exists(self.checkpoint):
+			os.remove(self.checkpoint)
+
+		return results
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument('markets', nargs='*', help='markets to backfill, every market by default')
+	parser.add_argument('--root', default='candles', help='candle store directory')
+	parser.add_argument('--interval', default='oneMin', choices=['oneMin', 'fiveMin', 'thirtyMin', 'hour', 'day'])
+	parser.add_argument('--workers', type=int, default=4)
+	parser.add_argument('--rate', type=float, default=None, help='GetTicks requests per second')
+	args = parser.parse_args()
+
+	logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+
+	with Bittrex(pool_maxsize=args.workers) as client:
+		backfill = Backfill(client, CandleStore(args.root, client), args.interval, args.workers, args.rate)
+		results = backfill.run(args.markets or None)
+
+	log.info('Done, %d markets synced, %d failed', len(results), len(results.errors))
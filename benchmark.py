@@ -0,0 +1,448 @@
+"""Benchmarks for the Bittrex client.
+
+Every benchmark runs against local stand-ins, bittrex.com is never contacted.
+
+	python benchmark.py [name ...]
+"""
+import argparse
+import contextlib
+import hashlib
+import hmac
+import io
+import json
+import math
+import random
+import time
+import tracemalloc
+from decimal import Decimal
+from uuid import uuid4
+
+import requests
+
+import bittrex
+import decoders
+from metrics import Metrics
+from transport import ReplayServer, ReplayTransport
+
+
+MARKETS_BODY = json.dumps({
+	'success': True,
+	'message': '',
+	'result': [{'MarketName': 'BTC-%03d' % i,
+				'MarketCurrency': 'C%03d' % i,
+				'BaseCurrency': 'BTC',
+				'MinTradeSize': 0.00000001,
+				'IsActive': True,
+				'Created': '2014-03-20T06:00:00'} for i in range(20)]
+}).encode()
+
+
+def _response(result):
+	return json.dumps({'success': True, 'message': '', 'result': result}).encode()
+
+
+def recorded_responses(seed=0, summaries=300, levels=10000, ticks=100000):
+	"""Large responses shaped like the ones bittrex.com sends, keyed by endpoint"""
+	rnd = random.Random(seed)
+	price = lambda: round(rnd.uniform(0.000001, 0.1), 8)
+
+	market_summaries = [{	'MarketName': 'BTC-%03d' % i,
+					'High': price(), 'Low': price(), 'Volume': price() * 1e6, 'Last': price(),
+					'BaseVolume': price() * 100, 'TimeStamp': '2017-08-01T07:19:30.15',
+					'Bid': price(), 'Ask': price(), 'OpenBuyOrders': rnd.randint(0, 5000),
+					'OpenSellOrders': rnd.randint(0, 5000), 'PrevDay': price(),
+					'Created': '2014-03-20T06:00:00', 'DisplayMarketName': None} for i in range(summaries)]
+
+	book = {'buy': [{'Quantity': price() * 1e4, 'Rate': price()} for _ in range(levels)],
+			'sell': [{'Quantity': price() * 1e4, 'Rate': price()} for _ in range(levels)]}
+
+	candles = [{	'O': price(), 'H': price(), 'L': price(), 'C': price(), 'V': price() * 1e5, 'BV': price(),
+				'T': '2017-%02d-%02dT%02d:%02d:00' % (1 + i // 44640 % 12, 1 + i // 1440 % 28, i // 60 % 24, i % 60)}
+				for i in range(ticks)]
+
+	return {'getmarketsummaries': _response(market_summaries),
+			'getorderbook': _response(book),
+			'GetTicks': _response(candles)}
+
+
+def peak_memory(func):
+	"""Run func, returns (seconds, peak bytes allocated while it ran)"""
+	tracemalloc.start()
+	try:
+		start = time.perf_counter()
+		func()
+		elapsed = time.perf_counter() - start
+		return elapsed, tracemalloc.get_traced_memory()[1]
+	finally:
+		tracemalloc.stop()
+
+
+def best_time(func, repeat=5):
+	times = []
+	for _ in range(repeat):
+		start = time.perf_counter()
+		func()
+		times.append(time.perf_counter() - start)
+	return min(times)
+
+
+def recordings(levels=500, ticks=10000):
+	"""Replay recordings for every request the client benchmarks make"""
+	responses = recorded_responses(levels=levels, ticks=ticks)
+	return {'/api/v1.1/public/getmarkets': (200, MARKETS_BODY),
+			'/api/v1.1/public/getmarketsummaries': (200, responses['getmarketsummaries']),
+			'/api/v1.1/public/getorderbook?depth=%d&market=BTC-ETH&type=both' % levels: (200, responses['getorderbook']),
+			'/api/v2.0/pub/market/getticks?marketName=BTC-ETH&tickInterval=oneMin': (200, responses['GetTicks']),
+			'/api/v1.1/account/getbalances': (200, _response([{'Currency': 'BTC', 'Balance': 1.5,
+																'Available': 1.5, 'Pending': 0.0}])),
+			'/api/v1.1/market/buylimit?market=BTC-ETH&quantity=1&rate=0.01': (200, _response({'uuid': 'e606d53c'}))}
+
+
+def local_client(server, **kwargs):
+	"""A Bittrex client that talks to a ReplayServer instead of bittrex.com"""
+	return bittrex.Bittrex(base=server.base, base_2=server.base_2, **kwargs)
+
+
+def measure(func, calls):
+	"""Call func calls times, returns a list of per-call latencies in seconds"""
+	latencies = []
+	with contextlib.redirect_stdout(io.StringIO()):
+		for _ in range(calls):
+			start = time.perf_counter()
+			func()
+			latencies.append(time.perf_counter() - start)
+	return latencies
+
+
+def report(name, latencies, peak=None):
+	latencies = sorted(latencies)
+	total = sum(latencies)
+	print('%-32s mean %8.3f ms  p50 %8.3f ms  p99 %8.3f ms  %9.1f calls/s%s' % (
+		name,
+		total / len(latencies) * 1000,
+		latencies[len(latencies) // 2] * 1000,
+		latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+		len(latencies) / total,
+		'  peak %8.1f KB/call' % (peak / 1e3) if peak is not None else ''))
+
+
+class _UnpooledSession(object):
+	"""Behaves like the old module-level requests.get, one connection per call"""
+
+	def get(self, url, **kwargs):
+		with requests.Session() as session:
+			return session.get(url, **kwargs)
+
+	def close(self):
+		pass
+
+
+def bench_session(calls=300):
+	"""Per-call latency of Bittrex.markets with and without the pooled session"""
+	with ReplayServer(recordings()) as server:
+		report('markets() without pool', measure(local_client(server, session=_UnpooledSession()).markets, calls))
+		with local_client(server) as client:
+			report('markets() with pool', measure(client.markets, calls))
+
+
+def client_calls(client, levels=500):
+	"""The calls of the client benchmark suite, by name"""
+	return [('markets()', client.markets),
+			('market_summaries()', client.market_summaries),
+			('order_book()', lambda: client.order_book('BTC-ETH', 'both', depth=levels)),
+			('GetTicks()', lambda: client.GetTicks('BTC-ETH', 'oneMin')),
+			('GetTicks(columnar)', lambda: client.GetTicks('BTC-ETH', 'oneMin', columnar=True)),
+			('balances() signed', client.balances),
+			('buy_limit() signed', lambda: client.buy_limit('BTC-ETH', 1, 0.01))]
+
+
+def run_suite(client, calls):
+	for name, call in client_calls(client):
+		with contextlib.redirect_stdout(io.StringIO()):
+			call()
+			peak = peak_memory(call)[1]
+		report(name, measure(call, calls), peak)
+
+
+def bench_client(calls=50):
+	"""Latency, throughput and allocations of the public and signed client methods.
+
+	Once in-process over ReplayTransport, which leaves only the client's own
+	overhead, and once over HTTP to a local ReplayServer.
+	"""
+	recorded = recordings()
+
+	print('-- in-process replay')
+	run_suite(bittrex.Bittrex('key', 'secret', transport=ReplayTransport(recorded)), calls)
+
+	print('-- local replay server')
+	with ReplayServer(recorded) as server:
+		with local_client(server, key='key', secret='secret') as client:
+			run_suite(client, calls)
+
+
+def _legacy_prepare(client, request_type, **kwargs):
+	"""How Bittrex.get built and signed a request before the endpoint table"""
+	parameters = client.check_parameters(kwargs, request_type)
+
+	if request_type in bittrex.ACCOUNT:
+		group = 'account'
+	elif request_type in bittrex.MARKET:
+		group = 'market'
+	else:
+		group = 'public'
+
+	if group in ['account', 'market']:
+		parameters = 'apikey={}&nonce={}'.format(client.key, str(uuid4())) + '&' + parameters
+
+	if parameters:
+		parameters = '?' + parameters
+
+	url = bittrex.BASE.format(version=bittrex.__version__, request_type=request_type, group=group) + parameters
+
+	print('GET %s' % url)
+
+	return url, {"apisign": hmac.new(client.secret.encode(), url.encode(), hashlib.sha512).hexdigest()}
+
+
+def bench_overhead(calls=20000):
+	"""Per-call cost of building and signing a request, before and after the fast path"""
+	uuid_client = bittrex.Bittrex('key', 'secret')
+	counter_client = bittrex.Bittrex('key', 'secret', nonce='counter')
+
+	for name, request_type, kwargs in (	('public', 'getticker', {'market': 'BTC-ETH'}),
+										('signed', 'buylimit', {'market': 'BTC-ETH', 'quantity': 1, 'rate': 0.01})):
+		report('%s legacy' % name, measure(lambda: _legacy_prepare(uuid_client, request_type, **kwargs), calls))
+		report('%s uuid nonce' % name, measure(lambda: uuid_client.prepare(request_type, **kwargs), calls))
+		report('%s counter nonce' % name, measure(lambda: counter_client.prepare(request_type, **kwargs), calls))
+
+
+def bench_metrics(calls=5000):
+	"""Overhead of collecting request metrics, in-process so nothing hides it"""
+	recorded = recordings()
+	plain = bittrex.Bittrex(transport=ReplayTransport(recorded))
+	measured = bittrex.Bittrex(transport=ReplayTransport(recorded), hooks=[Metrics()])
+
+	report('markets() without metrics', measure(plain.markets, calls))
+	report('markets() with metrics', measure(measured.markets, calls))
+
+
+def synthetic_candles(count, seed=0, interval=60):
+	"""A random walk of count candles, as candles.Candles"""
+	import numpy as np
+	from candles import Candles
+
+	rnd = np.random.RandomState(seed)
+	close = 0.05 * np.exp(np.cumsum(rnd.normal(0, 0.002, count)))
+	open_ = np.concatenate(([close[0]], close[:-1]))
+	spread = np.abs(rnd.normal(0, 0.001, count)) * close
+	volume = rnd.exponential(100.0, count)
+	return Candles(np.arange(count, dtype=np.int64) * interval + 1500000000, open_,
+					np.maximum(open_, close) + spread, np.minimum(open_, close) - spread, close, volume, volume * close)
+
+
+def bench_graph(frames=200, candles=100000):
+	"""Frame time of graph.Graph: a scripted window resize, then redrawing a long candle history"""
+	try:
+		from PySide.QtCore import QEvent, QPoint, Qt
+		from PySide.QtGui import QApplication, QImage, QMouseEvent, QPainter
+	except ImportError:
+		print('PySide is not installed, skipped')
+		return
+	import graph
+
+	app = QApplication.instance() or QApplication([])
+	view = graph.Graph()
+	image = QImage(1600, 800, QImage.Format_ARGB32_Premultiplied)
+
+	def frame(change):
+		start = time.perf_counter()
+		change()
+		painter = QPainter(image)
+		view.scene.render(painter)
+		painter.end()
+		return time.perf_counter() - start
+
+	# Drag the corner out to 1600x800 and back, like resizing the window by hand
+	sizes = [(int(700 + 900 * math.sin(math.pi * i / frames)), int(300 + 500 * math.sin(math.pi * i / frames)))
+			for i in range(frames)]
+
+	def resize(width, height):
+		view.resize(width, height)
+		view.updateGraphSize()
+
+	report('resize frame', [frame(lambda: resize(w, h)) for w, h in sizes])
+
+	resize(1600, 800)
+	view.setCandles(synthetic_candles(candles))
+	report('redraw %d candles' % candles, [frame(view.refreshSeries) for _ in range(frames)])
+	report('repaint %d candles, same view' % candles, [frame(lambda: None) for _ in range(frames)])
+
+	# A year of minute candles, zooming in and out around the middle, then panning a day wide view
+	year = synthetic_candles(525600 + frames)
+	view.setCandles(year[:525600])
+	start, end = view.xAxis.numericRange()
+	middle = (start + end) / 2.0
+	steps = [0.8] * (frames // 2) + [1.25] * (frames // 2)
+	report('zoom, a year of minutes', [frame(lambda: view.zoomX(middle, step)) for step in steps])
+
+	report('pan, a year of minutes', [frame(lambda: view.setXRange(start + i * 3600, start + i * 3600 + 86400))
+									for i in range(frames)])
+
+	# Sweeping the cursor over the plot: crosshair labels and the hover readout, without painting
+	rect = view.plotRect()
+	moves = [QMouseEvent(QEvent.MouseMove, QPoint(int(rect.left() + (i * 7) % rect.width()), int(rect.center().y())),
+						Qt.NoButton, Qt.NoButton, Qt.NoModifier) for i in range(frames * 10)]
+	report('mouse move', measure(lambda: view.mouseMoveEvent(moves.pop()), len(moves)))
+	view.clearCursor()
+
+	# Live candles: appending is cheap, the burst is drawn by one redraw on the frame timer
+	live = [year[i:i + 1] for i in range(525600, 525600 + frames)]
+	report('live append', measure(lambda: view.appendCandles(live.pop(0)), frames))
+	start = time.perf_counter()
+	while view._redrawTimer.isActive():
+		app.processEvents()
+	print('%-32s %8.3f ms until the one redraw' % ('live burst', (time.perf_counter() - start) * 1000))
+
+	view.close()
+	app.processEvents()
+
+
+def bench_records(snapshots=100):
+	"""Memory held by market_summaries snapshots and their construction time, dicts against records"""
+	import records
+
+	body = recorded_responses(levels=1, ticks=1)['getmarketsummaries']
+	loads = decoders.get_decoder()
+	forms = [	('dicts', lambda: loads(body)['result']),
+				('records', lambda: records.convert(records.MarketSummary, loads(body)['result'])),
+				('table', lambda: records.SummaryTable(loads(body)['result']))]
+
+	for name, build in forms:
+		elapsed = best_time(build, repeat=20)
+		tracemalloc.start()
+		try:
+			kept = [build() for _ in range(snapshots)]
+			held = tracemalloc.get_traced_memory()[0]
+		finally:
+			tracemalloc.stop()
+		print('%-8s %8.3f ms/snapshot  %8.1f KB/snapshot held over %d snapshots of %d markets' % (
+			name, elapsed * 1000, held / 1e3 / snapshots, snapshots, len(kept[0])))
+
+	summaries = records.convert(records.MarketSummary, loads(body)['result'])
+	elapsed = best_time(lambda: [s.TimeStamp for s in records.convert(records.MarketSummary, loads(body)['result'])])
+	print('%-8s %8.3f ms/snapshot  parsing every TimeStamp on first read' % ('records', elapsed * 1000))
+	elapsed = best_time(lambda: [s.TimeStamp for s in summaries])
+	print('%-8s %8.3f ms/snapshot  reading the parsed TimeStamps again' % ('records', elapsed * 1000))
+
+
+def _naive_indicators(candles, n=20):
+	"""Per-dict loops as written by GetTicks consumers: SMA, EMA, RSI, Bollinger and VWAP of one market"""
+	closes = [c['Close'] for c in candles]
+	result = {'sma': [], 'ema': [], 'rsi': [], 'bollinger': [], 'vwap': []}
+	alpha = 2.0 / (n + 1)
+	ema = None
+	gain = loss = 0.0
+	pv = v = 0.0
+	for i, c in enumerate(candles):
+		window = closes[max(0, i - n + 1):i + 1]
+		mean = sum(window) / len(window)
+		result['sma'].append(mean)
+		result['bollinger'].append((mean, 2 * (sum((x - mean) ** 2 for x in window) / len(window)) ** 0.5))
+		ema = c['Close'] if ema is None else alpha * c['Close'] + (1 - alpha) * ema
+		result['ema'].append(ema)
+		if i:
+			change = c['Close'] - closes[i - 1]
+			gain = (gain * (n - 1) + max(change, 0)) / n
+			loss = (loss * (n - 1) + max(-change, 0)) / n
+		result['rsi'].append(100.0 if not loss else 100.0 - 100.0 / (1 + gain / loss))
+		pv += (c['High'] + c['Low'] + c['Close']) / 3.0 * c['Volume']
+		v += c['Volume']
+		result['vwap'].append(pv / v if v else 0.0)
+	return result
+
+
+def bench_indicators(markets=100, length=1000):
+	"""Indicators for many markets: naive per-dict loops, one vectorized pass and an incremental update"""
+	import indicators
+	from candles import Candles
+
+	histories = [Candles.from_ticks(json.loads(recorded_responses(seed=i, summaries=0, levels=0, ticks=length)['GetTicks'])['result'])
+				for i in range(markets)]
+	dicts = [list(c.records()) for c in histories]
+	specs = [('sma', 20), ('ema', 20), ('rsi', 20), ('bollinger', 20, 2), ('vwap',)]
+
+	naive = best_time(lambda: [_naive_indicators(d) for d in dicts], repeat=1)
+	print('%-32s %10.1f ms' % ('naive per-dict', naive * 1000))
+
+	data = indicators.stack(histories)
+	engine = indicators.IndicatorEngine(specs)
+	print('%-32s %10.1f ms' % ('vectorized', best_time(lambda: engine.compute(data)) * 1000))
+
+	candle = dict((f, data[f][:, -1]) for f in ('H', 'L', 'C', 'V'))
+	print('%-32s %10.3f ms' % ('incremental update', best_time(lambda: engine.update(candle), repeat=100) * 1000))
+
+
+def bench_decode():
+	"""Decode time and peak memory of every installed JSON backend over recorded responses"""
+	def consume(body, loads):
+		for _ in decoders.iter_result(io.BytesIO(body), loads):
+			pass
+
+	def to_decimal(value):
+		if isinstance(value, float):
+			return Decimal(repr(value))
+		if isinstance(value, dict):
+			return dict((k, to_decimal(v)) for k, v in value.items())
+		if isinstance(value, list):
+			return [to_decimal(v) for v in value]
+		return value
+
+	for endpoint, body in sorted(recorded_responses().items()):
+		print('%s, %.1f MB' % (endpoint, len(body) / 1e6))
+		for name in decoders.available():
+			loads = decoders.get_decoder(name)
+			elapsed = best_time(lambda: loads(body))
+			peak = peak_memory(lambda: loads(body))[1]
+			print('  %-10s %8.1f ms  peak %8.1f MB' % (name, elapsed * 1000, peak / 1e6))
+
+		for numeric in ('decimal', 'fixed'):
+			loads = decoders.get_decoder(numeric=numeric)
+			elapsed = best_time(lambda: loads(body))
+			peak = peak_memory(lambda: loads(body))[1]
+			print('  %-10s %8.1f ms  peak %8.1f MB' % (numeric, elapsed * 1000, peak / 1e6))
+
+		# Converting after decoding, the second pass the numeric modes avoid
+		elapsed = best_time(lambda: to_decimal(json.loads(body)))
+		print('  %-10s %8.1f ms' % ('decimal*2', elapsed * 1000))
+
+		elapsed = best_time(lambda: consume(body, json.loads), repeat=1)
+		peak = peak_memory(lambda: consume(body, json.loads))[1]
+		print('  %-10s %8.1f ms  peak %8.1f MB' % ('streaming', elapsed * 1000, peak / 1e6))
+
+
+BENCHMARKS = {
+	'client': bench_client,
+	'decode': bench_decode,
+	'graph': bench_graph,
+	'indicators': bench_indicators,
+	'metrics': bench_metrics,
+	'overhead': bench_overhead,
+	'records': bench_records,
+	'session': bench_session,
+}
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument('names', nargs='*', metavar='name',
+						help='benchmarks to run, all of them by default: %s' % ', '.join(sorted(BENCHMARKS)))
+	args = parser.parse_args()
+
+	unknown = set(args.names) - set(BENCHMARKS)
+	if unknown:
+		parser.error('unknown benchmark(s): %s' % ', '.join(sorted(unknown)))
+
+	for name in args.names or sorted(BENCHMARKS):
+		print('== %s' % name)
+		BENCHMARKS[name]()
@@ -1,10 +1,14 @@
+import functools
 import hashlib
 import hmac
+import itertools
+import logging
 import time
 import requests
 from pprint import pprint
 from uuid import uuid4
 import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 try:
     from urllib import urlencode
@@ -14,8 +18,24 @@ except ImportError:
     from urllib.parse import urlencode
     from urllib.parse import urljoin
 
+try:
+	from urllib3.util.retry import Retry
+except ImportError:
+	from requests.packages.urllib3.util.retry import Retry
+
 import secrets
 
+import amounts
+import decoders
+import ratelimit
+import records
+from cache import ResponseCache
+from orderbook import OrderBook
+from metrics import RequestEvent
+from transport import RequestsTransport, TimedHTTPAdapter
+
+log = logging.getLogger(__name__)
+
 __version__ = 'v1.1'
 __version2__ = 'v2.0'
 
@@ -69,6 +89,22 @@ MARKET = [	'buylimit',
 			'selllimit',
 			'sellmarket']
 
+# Order placement goes ahead of queued market data requests, tick backfills go last
+PRIORITY = {	'buylimit': ratelimit.HIGH,
+				'buymarket': ratelimit.HIGH,
+				'selllimit': ratelimit.HIGH,
+				'sellmarket': ratelimit.HIGH,
+				'cancel': ratelimit.HIGH,
+				'TradeBuy': ratelimit.HIGH,
+				'TradeSell': ratelimit.HIGH,
+				'TradeCancel': ratelimit.HIGH,
+				'GetTicks': ratelimit.LOW}
+
+# request_type -> (group, requires authentication), request types not listed are public
+ENDPOINTS = dict(	[(request_type, ('account', True)) for request_type in ACCOUNT] +
+					[(request_type, ('market', True)) for request_type in MARKET])
+PUBLIC = ('public', False)
+
 PARAMETERS = {	'getopenorders': None,
 				'cancel': None,
 				'sellmarket': None,
@@ -83,9 +119,18 @@ PARAMETERS = {	'getopenorders': None,
 				'getmarkets': None
 			}
 
+TICK_TRANSLATION = {	'BV': 'BaseVolume',
+						'C': 'Close',
+						'H': 'High',
+						'L': 'Low',
+						'O': 'Open',
+						'T': 'TimeStamp',
+						'V': 'Volume'}
+
 class RequestError(Exception):
 	def __init__(self, error_code, url):
 		super(RequestError, self).__init__('Bittrex server responded with returncode %d. Url: %s' % (error_code, url))
+		self.status_code = error_code
 		self.url = url
 
 class ResponseError(Exception):
@@ -95,9 +140,62 @@ class ResponseError(Exception):
 		self.url = url
 
 
+class PublicRetry(Retry):
+	"""Retry that resends authenticated requests only when they never reached the server.
+
+	Every v1.1 call is a GET, placing orders and withdrawals included, so the
+	method can't tell which requests are safe to send twice. Authenticated
+	requests, those with an apikey and v2.0 auth calls, are only retried on
+	errors connecting, never after a read error or an error status.
+	"""
+
+	def increment(self, method=None, url=None, *args, **kwargs):
+		if url is not None and ('apikey=' in url or '/auth/' in url.lower()):
+			# status and other at 0 make the next count exhaust the retries
+			restricted = self.new(read=False, status=0, other=0)
+			return Retry.increment(restricted, method, url, *args, **kwargs)
+		return super(PublicRetry, self).increment(method, url, *args, **kwargs)
+
+
+def create_session(pool_connections=10, pool_maxsize=10, max_retries=0, backoff_factor=0):
+	"""Create a keep-alive requests.Session with a pooled adapter.
+
+	pool_connections is the number of hosts to keep a pool for, pool_maxsize
+	the number of connections kept open per host. Public requests are retried
+	on connection errors and 5xx/429 responses, authenticated ones only when
+	the connection couldn't be made, see PublicRetry.
+	"""
+	retry = PublicRetry(total=max_retries,
+						backoff_factor=backoff_factor,
+						status_forcelist=(429, 500, 502, 503, 504),
+						allowed_methods=frozenset(['GET']),
+						raise_on_status=False)
+
+	adapter = TimedHTTPAdapter(	pool_connections=pool_connections,
+								pool_maxsize=pool_maxsize,
+								max_retries=retry)
+
+	session = requests.Session()
+	session.mount('https://', adapter)
+	session.mount('http://', adapter)
+	return session
+
+
+class BatchResult(dict):
+	"""Results of a batch call keyed by market, failed markets are in errors"""
+
+	def __init__(self, *args, **kwargs):
+		super(BatchResult, self).__init__(*args, **kwargs)
+		self.errors = {}
+
+
 class Bittrex(object):
 
-	def __init__(self, key=None, secret=None):
+	def __init__(self, key=None, secret=None, session=None, timeout=10,
+				pool_connections=10, pool_maxsize=10, max_retries=0, backoff_factor=0,
+				max_workers=None, rate_limits=None, scheduler=None, cache=None, decoder=None,
+				book_source=None, transport=None, nonce='uuid', hooks=None, numeric='float',
+				typed=False, base=BASE, base_2=BASE_2):
 		self.key = key or ''
 		self.secret = secret or ''
 
@@ -105,78 +203,233 @@ class Bittrex(object):
 			raise TypeError('key and secret is should be a string. '
 				'Recieved %s, %s instead' % (type(key), type(secret)))
 
-	def get(self, request_type, **kwargs):
-		parameters = self.check_parameters(kwargs, request_type)
-
-		if request_type in ACCOUNT:
-			group = 'account'
-		elif request_type in MARKET:
-			group = 'market'
+		self.timeout = timeout
+		self.base = base
+		self.base_2 = base_2
+		self._urls = {}
+		# Called with a metrics.RequestEvent after every request, e.g. a metrics.Metrics
+		self.hooks = list(hooks or ())
+		self._hmac = None
+		# 'uuid' or 'counter', a counter nonce increases monotonically from the current time in ms
+		if nonce == 'counter':
+			self.nonce = functools.partial(next, itertools.count(int(time.time() * 1000)))
+		elif nonce == 'uuid':
+			self.nonce = lambda: str(uuid4())
 		else:
-			group = 'public'
-
-		if group != 'public' and not (self.key and self.secret):
-			raise Exception('To do a {} request, you have to set a key and secret.'.format(group))
+			raise ValueError("nonce should be 'uuid' or 'counter', recieved %r" % nonce)
+		self.max_workers = max_workers or pool_maxsize
+		# 'orjson', 'ujson', 'json' or any loads callable, the fastest installed backend by default
+		self.decode = decoders.get_decoder(decoder, numeric)
+		# 'float', 'decimal' or 'fixed', how amounts are decoded, see amounts.py
+		self.numeric = numeric
+		# Tickers, summaries and orders as records.Ticker, MarketSummary and Order instead of dicts
+		self.typed = typed
+		# Update source of the local order books, see orderbook.py
+		self.book_source = book_source
+		self.books = {}
+		self._executor = None
+		self.scheduler = scheduler if scheduler is not None else ratelimit.Scheduler(rate_limits)
+		# cache=True uses the default TTLs, a ResponseCache can be shared between clients
+		self.cache = ResponseCache() if cache is True else cache or None
+		self.session = session if session is not None else self.create_session(
+			pool_connections, pool_maxsize, max_retries, backoff_factor)
+		# Carries the requests, see transport.py for the replay transports
+		self.transport = transport if transport is not None else RequestsTransport(self.session, timeout)
+
+	def create_session(self, pool_connections, pool_maxsize, max_retries, backoff_factor):
+		return create_session(pool_connections, pool_maxsize, max_retries, backoff_factor)
+
+	def close(self):
+		if self._executor is not None:
+			self._executor.shutdown()
+			self._executor = None
+		self.transport.close()
+		self.session.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+	def group(self, request_type):
+		return ENDPOINTS.get(request_type, PUBLIC)[0]
+
+	def url(self, request_type, group):
+		"""Base url of request_type, formatted once per request type"""
+		url = self._urls.get(request_type)
+		if url is None:
+			url = self._urls[request_type] = self.base.format(	version=__version__,
+																request_type=request_type,
+																group=group)
+		return url
+
+	def prepare(self, request_type, **kwargs):
+		"""Build the url and signed headers of a v1.1 request"""
+		parameters = self.check_parameters(kwargs, request_type) if kwargs else ''
+		group, auth = ENDPOINTS.get(request_type, PUBLIC)
+
+		if auth:
+			if not (self.key and self.secret):
+				raise Exception('To do a {} request, you have to set a key and secret.'.format(group))
+
+			auth = 'apikey=%s&nonce=%s' % (self.key, self.nonce())
+
+			parameters = auth + ('&' + parameters if parameters else '')
+
+		url = self.url(request_type, group)
+		if parameters:
+			url += '?' + parameters
 
-		if group in ['account', 'market']:
-			auth = 'apikey={}&nonce={}'.format(self.key, str(uuid4()))
+		return url, self.sign(url)
 
-			parameters = auth + parameters
+	def prepare2(self, domain, group, method, **kwargs):
+		"""Build the url and signed headers of a v2.0 request"""
+		parameters = self.check_parameters(kwargs, group)
 
 		if parameters:
 			parameters = '?' + parameters
 
-		url = BASE.format(	version=__version__,
-							request_type=request_type,
-							group=group) + parameters
+		url = self.base_2.format(	version=__version2__,
+									domain=domain,
+									group=group,
+									method=method) + parameters
 
-		print('GET %s' % url)
+		return url, self.sign(url)
 
-		r = requests.get(url,
-			headers={"apisign": hmac.new(self.secret.encode(),
-									url.encode(),
-									hashlib.sha512).hexdigest()})
+	def sign(self, url):
+		# The HMAC is keyed once, every request signs a copy of it
+		if self._hmac is None or self._hmac[0] is not self.secret:
+			self._hmac = (self.secret, hmac.new(self.secret.encode(), digestmod=hashlib.sha512))
 
-		if not r.status_code == 200:
-			raise RequestError(r.status_code, url)
+		h = self._hmac[1].copy()
+		h.update(url.encode())
+		return {"apisign": h.hexdigest()}
 
-		data = r.json()
+	def result(self, url, data):
+		"""Unwrap a decoded response, raise ResponseError if it was unsuccessful"""
 		if not data['success']:
 			raise ResponseError(url, data['message'])
 
 		return data['result']
 
+	def fetch(self, url, headers, endpoint=None):
+		"""Send a request, returns the result and the size of the response body"""
+		if log.isEnabledFor(logging.DEBUG):
+			log.debug('GET %s', url, extra={'url': url})
+
+		if self.hooks:
+			return self.fetch_with_hooks(url, headers, endpoint)
+
+		r = self.transport.get(url, headers)
+
+		if not r.status_code == 200:
+			raise RequestError(r.status_code, url)
+
+		return self.result(url, self.decode(r.content)), len(r.content)
+
+	def fetch_with_hooks(self, url, headers, endpoint):
+		event = RequestEvent(endpoint, url, bytes_out=len(url) + sum(len(k) + len(v) + 4 for k, v in headers.items()))
+		try:
+			r = self.transport.get(url, headers)
+			event.status = r.status_code
+			event.bytes_in = len(r.content)
+			event.timings = dict(getattr(r, 'timings', None) or {})
+
+			if not r.status_code == 200:
+				raise RequestError(r.status_code, url)
+
+			start = time.perf_counter()
+			data = self.decode(r.content)
+			event.timings['decode'] = time.perf_counter() - start
+
+			return self.result(url, data), len(r.content)
+		except Exception as e:
+			event.error = e
+			raise
+		finally:
+			for hook in self.hooks:
+				hook(event)
+
+	def request(self, url, headers):
+		return self.fetch(url, headers)[0]
+
+	def stream(self, url, headers):
+		"""Yield the result items of a request as they are decoded from the response"""
+		if log.isEnabledFor(logging.DEBUG):
+			log.debug('GET %s', url, extra={'url': url, 'stream': True})
+
+		with self.transport.stream(url, headers) as r:
+			if not r.status_code == 200:
+				raise RequestError(r.status_code, url)
+
+			try:
+				for item in decoders.iter_result(r.raw, self.decode, self.numeric):
+					yield item
+			except decoders.Unsuccessful as e:
+				raise ResponseError(url, e.message)
+
+	def get(self, request_type, **kwargs):
+		group = self.group(request_type)
+
+		def load():
+			self.scheduler.acquire(group, PRIORITY.get(request_type, ratelimit.NORMAL))
+			return self.fetch(*self.prepare(request_type, **kwargs), endpoint=request_type)
+
+		# Authenticated requests are never cached
+		if self.cache is not None and group == 'public':
+			result = self.cache.fetch(request_type, kwargs, load)
+		else:
+			result = load()[0]
+
+		if self.typed:
+			return records.convert(records.TYPES.get(request_type), result)
+		return result
+
 	def get2(self, domain, group, method, **kwargs):
-		parameters = self.check_parameters(kwargs, group)
+		def load():
+			self.scheduler.acquire(domain, PRIORITY.get(method, ratelimit.NORMAL))
+			return self.fetch(*self.prepare2(domain, group, method, **kwargs), endpoint=method)
 
-		if parameters:
-			parameters = '?' + parameters
+		if self.cache is not None and domain == 'pub':
+			# _ is a cache buster timestamp, it doesn't identify the request
+			return self.cache.fetch(method, dict((k, v) for k, v in kwargs.items() if k != '_'), load)
 
-		url = BASE_2.format(version=__version2__,
-							domain=domain,
-							group=group,
-							method=method) + parameters
+		return load()[0]
 
-		print('GET %s' % url)
+	def iter_get(self, request_type, **kwargs):
+		"""Like get, but yields the items of the result while the response is decoded"""
+		self.scheduler.acquire(self.group(request_type), PRIORITY.get(request_type, ratelimit.NORMAL))
+		return self.stream(*self.prepare(request_type, **kwargs))
 
-		r = requests.get(url,
-			headers={"apisign": hmac.new(self.secret.encode(),
-									url.encode(),
-									hashlib.sha512).hexdigest()})
+	def iter_get2(self, domain, group, method, **kwargs):
+		self.scheduler.acquire(domain, PRIORITY.get(method, ratelimit.NORMAL))
+		return self.stream(*self.prepare2(domain, group, method, **kwargs))
 
-		if not r.status_code == 200:
-			raise RequestError(r.status_code, url)
+	def batch(self, method, markets, *args, **kwargs):
+		"""Call method(market, *args, **kwargs) for every market on the thread pool.
 
-		data = r.json()
-		if not data['success']:
-			raise ResponseError(url, data['message'])
+		Failing markets don't abort the batch, their RequestError, ResponseError or
+		connection error is collected in the errors of the returned BatchResult.
+		"""
+		if self._executor is None:
+			self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
 
-		return data['result']
+		futures = [(market, self._executor.submit(method, market, *args, **kwargs)) for market in markets]
 
+		results = BatchResult()
+		for market, future in futures:
+			try:
+				results[market] = future.result()
+			except (RequestError, ResponseError, requests.RequestException) as e:
+				results.errors[market] = e
+
+		return results
 
 	def check_parameters(self, parameters, request_type):
 		"""Verify the parameters, raise error if incorrect"""
-		return urlencode(parameters)
+		# Amounts go out exactly, floats included, never in exponent notation
+		return urlencode([(k, amounts.format_amount(v)) for k, v in parameters.items()])
 
 	def markets(self):
 		return self.get('getmarkets')
@@ -193,9 +446,33 @@ class Bittrex(object):
 	def market_summary(self, market):
 		return self.get('getmarketsummary', market=market)
 
+	def summary_table(self):
+		"""market_summaries as a records.SummaryTable"""
+		return records.SummaryTable(self.market_summaries())
+
 	def order_book(self, market, book_type, depth=20):
 		return self.get('getorderbook', market=market, type=book_type, depth=depth)
 
+	def tickers(self, markets):
+		return self.batch(self.ticker, markets)
+
+	def summaries(self, markets):
+		return self.batch(self.market_summary, markets)
+
+	def order_books(self, markets, book_type='both', depth=20):
+		return self.batch(self.order_book, markets, book_type, depth=depth)
+
+	def local_order_book(self, market, depth=50):
+		"""In-memory OrderBook of market, seeded once and kept current from book_source"""
+		if self.book_source is None:
+			raise ValueError('local_order_book needs a book_source to keep the book current, e.g. a streaming.MarketStream')
+
+		book = self.books.get(market)
+		if book is None:
+			book = self.books[market] = OrderBook(market, self.book_source)
+			book.seed(self.order_book(market, 'both', depth=depth))
+		return book.sync()
+
 	def market_history(self, market):
 		return self.get('getmarkethistory', market=market)
 
@@ -251,22 +528,40 @@ class Bittrex(object):
 		else:
 			return self.get('getdeposithistory')
 
+	def iter_history(self, request_type, cursor=None, **kwargs):
+		"""Yield history records while they are decoded, only the new ones with a history.HistoryCursor"""
+		records = self.iter_get(request_type, **kwargs)
+		if cursor is None:
+			return records
+		return cursor.new(request_type, records, **kwargs)
+
+	def iter_order_history(self, market=None, cursor=None):
+		if market is not None:
+			return self.iter_history('getorderhistory', cursor, market=market)
+		else:
+			return self.iter_history('getorderhistory', cursor)
+
+	def iter_withdrawl_history(self, currency=None, cursor=None):
+		if currency is not None:
+			return self.iter_history('getwithdrawalhistory', cursor, currency=currency)
+		else:
+			return self.iter_history('getwithdrawalhistory', cursor)
+
+	def iter_deposit_history(self, currency=None, cursor=None):
+		if currency is not None:
+			return self.iter_history('getdeposithistory', cursor, currency=currency)
+		else:
+			return self.iter_history('getdeposithistory', cursor)
+
 	def timestamp_to_datetime(self, timestamp):
 		return datetime.datetime.strptime(timestamp.split('.')[0], '%Y-%m-%dT%H:%M:%S')
 
 	def GetBTCPrice(self):
 		return self.get2('pub', 'currencies', 'GetBTCPrice')
 
-	def GetTicks(self, marketName, tickInterval, timeStamp=None, convertDatetime=False):
+	def GetTicks(self, marketName, tickInterval, timeStamp=None, convertDatetime=False, columnar=False):
 		# 	Options: ["oneMin", "fiveMin", "thirtyMin", "hour", "day"]
-
-		translation = {	'BV': 'BaseVolume',
-						'C': 'Close',
-						'H': 'High',
-						'L': 'Low',
-						'O': 'Open',
-						'T': 'TimeStamp',
-						'V': 'Volume'}
+		#	columnar=True returns a candles.Candles instead of a list of dicts
 
 		if timeStamp is None:
 			timeStamp = int(time.time() * 1000)
@@ -274,13 +569,30 @@ class Bittrex(object):
 		data = self.get2('pub', 'market', 'GetTicks',
 						marketName=marketName, tickInterval=tickInterval, _=str(timeStamp))
 
+		return self.translate_ticks(data, convertDatetime, columnar)
+
+	def GetLatestTick(self, marketName, tickInterval, convertDatetime=False, columnar=False):
+		# The newest candle only, a list of one like GetTicks
+
+		data = self.get2('pub', 'market', 'GetLatestTick',
+						marketName=marketName, tickInterval=tickInterval, _=str(int(time.time() * 1000)))
+
+		return self.translate_ticks(data, convertDatetime, columnar)
+
+	def ticks(self, markets, tickInterval, convertDatetime=False, columnar=False):
+		return self.batch(self.GetTicks, markets, tickInterval, convertDatetime=convertDatetime, columnar=columnar)
+
+	def translate_ticks(self, data, convertDatetime=False, columnar=False):
+		if columnar:
+			from candles import Candles
+			return Candles.from_ticks(data)
+
 		for d in data:
 			if convertDatetime:
 				d['T'] = self.timestamp_to_datetime(d['T'])
-			for k, v in translation.items():
+			for k, v in TICK_TRANSLATION.items():
 				d[v] = d.pop(k)
 
-
 		return data
 
 
@@ -0,0 +1,128 @@
+"""TTL response cache for the public Bittrex endpoints.
+
+Entries are keyed on the request (request type and parameters), not on the
+url, expire after a per-endpoint TTL and are evicted least recently used
+first once the cache holds more than max_entries or max_bytes. Concurrent
+identical requests are coalesced into a single fetch.
+
+Cached results are shared between callers and should not be modified.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+# Seconds a response of an endpoint is kept, endpoints without a TTL are never cached
+DEFAULT_TTL = {	'getmarkets': 3600,
+				'getcurrencies': 3600,
+				'getmarketsummaries': 1,
+				'getmarketsummary': 1,
+				'getmarkethistory': 1,
+				'getorderbook': 0.5,
+				'getticker': 0.5,
+				'GetBTCPrice': 1,
+				'GetMarketSummaries': 1,
+				'GetMarketSummary': 1}
+
+
+class _Pending(object):
+	__slots__ = ('event', 'value', 'error')
+
+	def __init__(self):
+		self.event = threading.Event()
+		self.value = None
+		self.error = None
+
+
+class ResponseCache(object):
+	def __init__(self, ttl=None, max_entries=1024, max_bytes=32 * 1024 * 1024):
+		self.ttl = dict(DEFAULT_TTL)
+		self.ttl.update(ttl or {})
+		self.max_entries = max_entries
+		self.max_bytes = max_bytes
+
+		self.size = 0
+		self.hits = 0
+		self.misses = 0
+		self.coalesced = 0
+
+		self._entries = OrderedDict()
+		self._pending = {}
+		self._lock = threading.Lock()
+
+	def key(self, endpoint, parameters):
+		return (endpoint,) + tuple(sorted(parameters.items()))
+
+	def fetch(self, endpoint, parameters, loader):
+		"""Return the cached response of the request or load it.
+
+		loader() returns a (value, size in bytes) tuple, it is called once for
+		all threads asking for the same request at the same time.
+		"""
+		ttl = self.ttl.get(endpoint)
+		if not ttl:
+			return loader()[0]
+
+		key = self.key(endpoint, parameters)
+
+		with self._lock:
+			entry = self._entries.get(key)
+			if entry is not None:
+				expires, value, size = entry
+				if expires > time.monotonic():
+					self._entries.move_to_end(key)
+					self.hits += 1
+					return value
+				self._remove(key)
+
+			pending = self._pending.get(key)
+			owner = pending is None
+			if owner:
+				pending = self._pending[key] = _Pending()
+				self.misses += 1
+			else:
+				self.coalesced += 1
+
+		if not owner:
+			pending.event.wait()
+			if pending.error is not None:
+				raise pending.error
+			return pending.value
+
+		try:
+			value, size = loader()
+		except BaseException as e:
+			pending.error = e
+			raise
+		else:
+			pending.value = value
+			with self._lock:
+				self._store(key, time.monotonic() + ttl, value, size)
+			return value
+		finally:
+			with self._lock:
+				del self._pending[key]
+			pending.event.set()
+
+	def _store(self, key, expires, value, size):
+		if size > self.max_bytes:
+			return
+
+		if key in self._entries:
+			self._remove(key)
+
+		self._entries[key] = (expires, value, size)
+		self.size += size
+
+		while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+			self._remove(next(iter(self._entries)))
+
+	def _remove(self, key):
+		self.size -= self._entries.pop(key)[2]
+
+	def clear(self):
+		with self._lock:
+			self._entries.clear()
+			self.size = 0
+
+	def __len__(self):
+		return len(self._entries)
@@ -0,0 +1,107 @@
+"""Columnar candles, requires numpy.
+
+Candles holds a GetTicks history as one array per field: int64 epoch seconds
+in T and float64 arrays for O, H, L, C, V and BV. Slicing, also by time range
+with between, returns views on the same arrays instead of copies.
+"""
+import datetime
+
+import numpy as np
+
+from bittrex import TICK_TRANSLATION as TRANSLATION
+
+FIELDS = ('T', 'O', 'H', 'L', 'C', 'V', 'BV')
+PRICE_FIELDS = FIELDS[1:]
+
+# Layout of a candlestore record
+RECORD_DTYPE = np.dtype([('T', '<i8')] + [(f, '<f8') for f in PRICE_FIELDS])
+
+
+def parse_timestamps(timestamps):
+	"""Bittrex timestamp strings to int64 epoch seconds in one vectorized pass"""
+	return np.array(timestamps, dtype='datetime64[ms]').astype('datetime64[s]').astype(np.int64)
+
+
+class Candles(object):
+	__slots__ = FIELDS
+
+	def __init__(self, T, O, H, L, C, V, BV):
+		self.T = T
+		self.O = O
+		self.H = H
+		self.L = L
+		self.C = C
+		self.V = V
+		self.BV = BV
+
+	@classmethod
+	def from_ticks(cls, data):
+		"""Build from the raw (untranslated) list of GetTicks candles"""
+		n = len(data)
+		columns = dict((f, np.fromiter((d[f] for d in data), np.float64, n)) for f in PRICE_FIELDS)
+		return cls(parse_timestamps([d['T'] for d in data]), **columns)
+
+	@classmethod
+	def from_records(cls, records):
+		"""Build from a structured array of RECORD_DTYPE, e.g. a memory mapped candle file"""
+		return cls(**dict((f, records[f]) for f in FIELDS))
+
+	@classmethod
+	def empty(cls):
+		return cls.from_records(np.empty(0, dtype=RECORD_DTYPE))
+
+	def __len__(self):
+		return len(self.T)
+
+	def __getitem__(self, index):
+		if isinstance(index, slice):
+			return Candles(*[getattr(self, f)[index] for f in FIELDS])
+		return self.record(index)
+
+	def index(self, timestamp):
+		"""Position of the first candle at or after timestamp (epoch seconds)"""
+		return int(np.searchsorted(self.T, timestamp, side='left'))
+
+	def between(self, start=None, end=None):
+		"""Candles with start <= T < end, a view on the same arrays"""
+		first = self.index(start) if start is not None else 0
+		last = self.index(end) if end is not None else len(self)
+		return self[first:last]
+
+	def record(self, i, convertDatetime=False):
+		"""Candle i in the translated GetTicks form"""
+		timestamp = datetime.datetime(1970, 1, 1) + datetime.timedelta(seconds=int(self.T[i]))
+		d = {TRANSLATION['T']: timestamp if convertDatetime else timestamp.strftime('%Y-%m-%dT%H:%M:%S')}
+		for f in PRICE_FIELDS:
+			d[TRANSLATION[f]] = float(getattr(self, f)[i])
+		return d
+
+	def records(self, convertDatetime=False):
+		"""Lazy list-of-dicts view in the form GetTicks returns"""
+		return CandleRecords(self, convertDatetime)
+
+
+class CandleRecords(object):
+	"""Read-only sequence of translated candle dicts, built on access"""
+
+	def __init__(self, candles, convertDatetime=False):
+		self.candles = candles
+		self.convertDatetime = convertDatetime
+
+	def __len__(self):
+		return len(self.candles)
+
+	def __getitem__(self, index):
+		if isinstance(index, slice):
+			return CandleRecords(self.candles[index], self.convertDatetime)
+
+		if index < 0:
+			index += len(self)
+		if not 0 <= index < len(self):
+			raise IndexError('candle index out of range')
+
+		return self.candles.record(index, self.convertDatetime)
+
+	def __iter__(self):
+		for i in range(len(self)):
+			yield self.candles.record(i, self.convertDatetime)
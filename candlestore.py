@@ -0,0 +1,144 @@
+"""On-disk candle store for GetTicks histories.
+
+Every market and tick interval gets its own file of fixed size little-endian
+records (int64 epoch seconds, float64 open, high, low, close, volume and base
+volume) sorted on time. Files are only appended to, so a sync downloads the
+history once and afterwards only adds the candles newer than the last one
+stored. Reads are served from a memory map and never touch the network.
+"""
+import calendar
+import mmap
+import os
+import struct
+import time
+
+RECORD = struct.Struct('<q6d')
+FIELDS = ('T', 'O', 'H', 'L', 'C', 'V', 'BV')
+EXTENSION = '.candles'
+
+
+def parse_timestamp(timestamp):
+	"""Bittrex timestamp string (UTC) to epoch seconds"""
+	return calendar.timegm(time.strptime(timestamp.split('.')[0], '%Y-%m-%dT%H:%M:%S'))
+
+
+class CandleStore(object):
+	def __init__(self, root, client=None):
+		"""root is the directory of the store, client the Bittrex client used by sync_ticks"""
+		self.root = root
+		self.client = client
+
+	def path(self, market, interval):
+		return os.path.join(self.root, interval, market + EXTENSION)
+
+	def markets(self, interval):
+		directory = os.path.join(self.root, interval)
+		if not os.path.isdir(directory):
+			return []
+		return sorted(f[:-len(EXTENSION)] for f in os.listdir(directory) if f.endswith(EXTENSION))
+
+	def count(self, market, interval):
+		path = self.path(market, interval)
+		if not os.path.exists(path):
+			return 0
+		return os.path.getsize(path) // RECORD.size
+
+	def last_timestamp(self, market, interval):
+		"""Epoch seconds of the newest stored candle, None if there are none"""
+		path = self.path(market, interval)
+		if not os.path.exists(path):
+			return None
+
+		with open(path, 'rb') as f:
+			size = os.fstat(f.fileno()).st_size // RECORD.size * RECORD.size
+			if not size:
+				return None
+			f.seek(size - RECORD.size)
+			return RECORD.unpack(f.read(RECORD.size))[0]
+
+	def append(self, market, interval, candles):
+		"""Store raw GetTicks candles, returns the number of candles written.
+
+		Candles older than the last stored one are skipped, a candle with the
+		same timestamp as the last one replaces it, since the newest candle of
+		a GetTicks response is still being formed.
+		"""
+		path = self.path(market, interval)
+		directory = os.path.dirname(path)
+		if not os.path.isdir(directory):
+			os.makedirs(directory)
+
+		last = self.last_timestamp(market, interval)
+
+		records = []
+		for c in candles:
+			t = c['T'] if isinstance(c['T'], int) else parse_timestamp(c['T'])
+			if last is None or t >= last:
+				records.append((t, c['O'], c['H'], c['L'], c['C'], c['V'], c['BV']))
+
+		if not records:
+			return 0
+
+		records.sort(key=lambda r: r[0])
+
+		with open(path, 'r+b' if os.path.exists(path) else 'wb') as f:
+			# Drop a partially written record left by an interrupted append
+			size = os.fstat(f.fileno()).st_size // RECORD.size * RECORD.size
+			if records[0][0] == last:
+				size -= RECORD.size
+			f.truncate(size)
+			f.seek(size)
+			f.write(b''.join(RECORD.pack(*r) for r in records))
+
+		return len(records)
+
+	def sync_ticks(self, market, interval):
+		"""Download the candles of market newer than the stored ones, returns the number written"""
+		if self.client is None:
+			raise ValueError('CandleStore needs a client to sync')
+
+		data = self.client.get2('pub', 'market', 'GetTicks',
+								marketName=market, tickInterval=interval, _=str(int(time.time() * 1000)))
+
+		return self.append(market, interval, data)
+
+	def _bisect(self, buf, count, timestamp):
+		lo, hi = 0, count
+		while lo < hi:
+			mid = (lo + hi) // 2
+			if struct.unpack_from('<q', buf, mid * RECORD.size)[0] < timestamp:
+				lo = mid + 1
+			else:
+				hi = mid
+		return lo
+
+	def read(self, market, interval, start=None, end=None):
+		"""Stored candles with start <= T < end as (T, O, H, L, C, V, BV) tuples.
+
+		start and end are epoch seconds, without them the range is open ended.
+		"""
+		path = self.path(market, interval)
+		count = self.count(market, interval)
+		if not count:
+			return []
+
+		with open(path, 'rb') as f:
+			buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+			try:
+				first = self._bisect(buf, count, start) if start is not None else 0
+				last = self._bisect(buf, count, end) if end is not None else count
+				return list(RECORD.iter_unpack(buf[first * RECORD.size:last * RECORD.size]))
+			finally:
+				buf.close()
+
+	def candles(self, market, interval, start=None, end=None):
+		"""Like read, as a candles.Candles memory mapped on the file (requires numpy)"""
+		import numpy as np
+		from candles import Candles, RECORD_DTYPE
+
+		count = self.count(market, interval)
+		if not count:
+			return Candles.empty()
+
+		records = np.memmap(self.path(market, interval), dtype=RECORD_DTYPE, mode='r', shape=(count,))
+		return Candles.from_records(records).between(start, end)
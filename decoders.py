@@ -0,0 +1,106 @@
+"""JSON decoding backends for the Bittrex client.
+
+get_decoder returns a loads function for orjson, ujson or the standard
+library json module, by default the fastest one that is installed. With a
+numeric mode other than 'float' (see amounts.py) it is always json, the only
+backend with a parse_float hook.
+iter_result decodes a response incrementally with ijson and yields the
+items of its result without building the whole document.
+"""
+import importlib
+import json
+from decimal import Decimal
+
+import amounts
+
+BACKENDS = ('orjson', 'ujson', 'json')
+
+
+class Unsuccessful(ValueError):
+	def __init__(self, message):
+		super(Unsuccessful, self).__init__(message)
+		self.message = message
+
+
+def available():
+	"""Names of the installed backends, fastest first"""
+	names = []
+	for name in BACKENDS:
+		try:
+			importlib.import_module(name)
+		except ImportError:
+			continue
+		names.append(name)
+	return names
+
+
+def get_decoder(backend=None, numeric='float'):
+	"""loads function of backend, a backend name, a callable or None for the fastest one"""
+	if callable(backend):
+		return backend
+
+	if numeric != 'float':
+		if backend not in (None, 'json'):
+			raise ValueError('numeric=%r needs the json backend, recieved %r' % (numeric, backend))
+		return amounts.loads(numeric)
+
+	if backend is None:
+		backend = available()[0]
+
+	if backend not in BACKENDS:
+		raise ValueError('Unknown JSON backend %r, choose from %s' % (backend, ', '.join(BACKENDS)))
+
+	return importlib.import_module(backend).loads
+
+
+def iter_result(fileobj, loads=json.loads, numeric='float'):
+	"""Yield the items of the result of a Bittrex response read from fileobj.
+
+	Raises Unsuccessful when the response reports failure. Without ijson the
+	whole response is decoded with loads first, which then has to decode
+	numbers the numeric way itself.
+	"""
+	try:
+		import ijson
+		from ijson.common import ObjectBuilder
+	except ImportError:
+		data = loads(fileobj.read())
+		if not data['success']:
+			raise Unsuccessful(data['message'])
+		for item in data['result'] or ():
+			yield item
+		return
+
+	success = None
+	message = None
+	# Without use_float ijson parses numbers with a fraction as Decimal
+	events = ijson.parse(fileobj, use_float=numeric == 'float')
+	if numeric == 'fixed':
+		events = ((p, e, amounts.Fixed(v) if isinstance(v, Decimal) else v) for p, e, v in events)
+
+	for prefix, event, value in events:
+		if prefix == 'success':
+			success = value
+		elif prefix == 'message':
+			message = value
+		elif prefix == 'result.item':
+			if not success:
+				raise Unsuccessful(message)
+
+			if event not in ('start_map', 'start_array'):
+				yield value
+				continue
+
+			builder = ObjectBuilder()
+			depth = 1
+			while depth:
+				builder.event(event, value)
+				prefix, event, value = next(events)
+				if event in ('start_map', 'start_array'):
+					depth += 1
+				elif event in ('end_map', 'end_array'):
+					depth -= 1
+			yield builder.value
+
+	if not success:
+		raise Unsuccessful(message)
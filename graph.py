@@ -1,10 +1,29 @@
 import sys
 import random
+import calendar
 import datetime
+import logging
+import math
 
+import numpy as np
+import requests
 from PySide.QtGui import *
 from PySide.QtCore import *
 
+import plotdata
+from bittrex import Bittrex, RequestError, ResponseError
+from resample import seconds
+
+log = logging.getLogger(__name__)
+
+try:
+	xrange
+except NameError:
+	xrange = range
+
+
+EPOCH = datetime.datetime(1970, 1, 1)
+
 
 class Graph(QGraphicsView):
 
@@ -34,6 +53,24 @@ class Graph(QGraphicsView):
 		self.xDividers = []
 		self.yDividers = []
 
+		# Series items drawn in the plot area, see Series
+		self.series = []
+		self.candles = None
+		self.pyramid = None
+		self.candleSeries = None
+		self.volumeSeries = None
+
+		# Wheel zoom factor per notch, pan state while the left button drags the plot
+		self.zoomStep = 1.25
+		self._drag = None
+
+		# Live updates are drawn at most frameRate times a second, a burst of them in one redraw
+		self.frameRate = 30
+		self._follow = False
+		self._redrawTimer = QTimer(self)
+		self._redrawTimer.setSingleShot(True)
+		self._redrawTimer.timeout.connect(self.redraw)
+
 		self.values = [(x, i) for x, i in enumerate(random.sample(xrange(100), 10))]
 		self.x_values = [i[0] for i in self.values]
 		self.y_values = [i[1] for i in self.values]
@@ -64,6 +101,15 @@ class Graph(QGraphicsView):
 		self.scene.addItem(self.yAxis)
 		# self.yAxis.cursorLine.glow()
 
+		# Readout of the candle under the cursor, its text is replaced when another candle is hovered
+		self.readout = QGraphicsSimpleTextItem()
+		self.readout.setBrush(QBrush(QColor('#BFBFBF')))
+		self.readout.setZValue(2)
+		self.readout.setVisible(False)
+		self.scene.addItem(self.readout)
+		self._hoverIndex = None
+		self._crossCursor = False
+
 		self.setScene(self.scene)
 		self.setMouseTracking(True)
 
@@ -78,32 +124,193 @@ class Graph(QGraphicsView):
 
 		self.xAxis.update()
 		self.yAxis.update()
+		self.refreshSeries()
+
+	def plotRect(self):
+		"""Area within the axes the series are drawn in"""
+		left = self.graphOrigin.x() + self._graphOffsetX
+		bottom = self.graphOrigin.y() - self._graphOffsetY
+		return QRectF(left, self._contentMarginTop,
+						self.width() - self._contentMarginRight - left, bottom - self._contentMarginTop)
+
+	def addSeries(self, series):
+		self.series.append(series)
+		self.scene.addItem(series)
+		series.refresh()
+		return series
+
+	def refreshSeries(self):
+		for series in self.series:
+			series.refresh()
+
+	def setCandles(self, candles):
+		"""Chart a candles.Candles history as candlesticks over volume bars, fitting the axes to it"""
+		self.candles = candles
+		self.pyramid = plotdata.Pyramid(candles)
+		self._hoverIndex = None
+		if self.candleSeries is None:
+			self.volumeSeries = self.addSeries(VolumeSeries(self))
+			self.candleSeries = self.addSeries(CandleSeries(self))
+
+		self.volumeSeries.setData(candles, self.pyramid)
+		self.candleSeries.setData(candles, self.pyramid)
+
+		if len(candles):
+			self.setXRange(candles.T[0], candles.T[-1] + self.pyramid.period)
+
+	def appendCandles(self, candles):
+		"""Add live candles, a first candle at the time of the last one replaces it.
+
+		The view keeps following the newest candle when it was showing it.
+		"""
+		if self.pyramid is None or not len(self.candles):
+			return self.setCandles(candles)
+		if not len(candles):
+			return
+
+		start, end = self.xAxis.numericRange()
+		self._follow = self._follow or end >= self.candles.T[-1]
+
+		self.pyramid.extend(candles)
+		self.candles = self.pyramid.levels[0]
+		self.candleSeries.candles = self.volumeSeries.candles = self.candles
+		self._hoverIndex = None
+		self.scheduleRedraw()
+
+	def scheduleRedraw(self):
+		if not self._redrawTimer.isActive():
+			self._redrawTimer.start(int(1000 / self.frameRate))
+
+	def redraw(self):
+		if self._follow:
+			self._follow = False
+			start, end = self.xAxis.numericRange()
+			last = self.candles.T[-1] + self.pyramid.period
+			if last > end:
+				return self.setXRange(start + last - end, last)
+
+		self.fitY()
+		self.refreshSeries()
+
+	def setXRange(self, start, end):
+		"""Show the times from start to end, epoch seconds, with the price axis fitted to them"""
+		self.xAxis.setRange(self.xAxis.fromNumber(start), self.xAxis.fromNumber(end))
+		self.fitY()
+		self.refreshSeries()
+
+	def fitY(self, margin=0.05):
+		if self.pyramid is None:
+			return
+		start, end = self.xAxis.numericRange()
+		prices = self.pyramid.value_range(start, end, self.plotRect().width())
+		if prices is not None:
+			low, high = prices
+			pad = (high - low) * margin or abs(high) * margin or 1.0
+			self.yAxis.setRange(low - pad, high + pad)
+
+	def zoomX(self, anchor, scale):
+		"""Scale the time range by scale, keeping the time anchor where it is"""
+		start, end = self.xAxis.numericRange()
+		span = min(max((end - start) * scale, self.minSpan()), self.maxSpan())
+		left = anchor - (anchor - start) / float(end - start) * span
+		self.setXRange(left, left + span)
+
+	def minSpan(self):
+		period = self.pyramid.period if self.pyramid is not None else 60.0
+		return period * 10
+
+	def maxSpan(self):
+		if self.candles is None or not len(self.candles):
+			return float('inf')
+		return (self.candles.T[-1] - self.candles.T[0] + self.pyramid.period) * 1.5
+
+	def wheelEvent(self, event):
+		rect = self.plotRect()
+		if self.candles is None or not rect.contains(QPointF(event.pos())):
+			return super(Graph, self).wheelEvent(event)
+
+		start, end = self.xAxis.numericRange()
+		anchor = start + (event.pos().x() - rect.left()) / rect.width() * (end - start)
+		# Rolling forward zooms in
+		self.zoomX(anchor, self.zoomStep ** (-event.delta() / 120.0))
+		event.accept()
+
+	def mousePressEvent(self, event):
+		if event.button() == Qt.LeftButton and self.candles is not None and self.plotRect().contains(QPointF(event.pos())):
+			start, end = self.xAxis.numericRange()
+			self._drag = (event.pos().x(), start, end)
+			event.accept()
+		else:
+			super(Graph, self).mousePressEvent(event)
+
+	def mouseReleaseEvent(self, event):
+		if self._drag is not None and event.button() == Qt.LeftButton:
+			self._drag = None
+			event.accept()
+		else:
+			super(Graph, self).mouseReleaseEvent(event)
 
 	def mouseMoveEvent(self, event):
-		x = event.pos().x()
-		y = event.pos().y()
-
-		min_x = self.graphOrigin.x() + self._graphOffsetX
-		max_x = self.width() - self._contentMarginRight
-		min_y = self._contentMarginTop
-		max_y = self.height() - (self._contentMarginBottom + self._graphOffsetY + self._graphBoundY)
-		if min_x <= x <= max_x and min_y <= y <= max_y:
-			self.xAxis.setCursorPos(event.pos())
-			self.yAxis.setCursorPos(event.pos())
-			QApplication.setOverrideCursor(Qt.CrossCursor)
+		if self._drag is not None:
+			x, start, end = self._drag
+			shift = (x - event.pos().x()) * (end - start) / self.plotRect().width()
+			self.setXRange(start + shift, end + shift)
+
+		pos = event.pos()
+		if self.plotRect().contains(QPointF(pos)):
+			self.xAxis.setCursorPos(pos)
+			self.yAxis.setCursorPos(pos)
+			self.hover(pos)
+			# Override cursors stack, set it once when the cursor enters the plot
+			if not self._crossCursor:
+				QApplication.setOverrideCursor(Qt.CrossCursor)
+				self._crossCursor = True
 		else:
-			self.xAxis.setCursorPos(None)
-			self.yAxis.setCursorPos(None)
+			self.clearCursor()
+
+	def clearCursor(self):
+		self.xAxis.setCursorPos(None)
+		self.yAxis.setCursorPos(None)
+		self.hover(None)
+		if self._crossCursor:
 			QApplication.restoreOverrideCursor()
+			self._crossCursor = False
+
+	def hover(self, pos):
+		"""Show the candle nearest to pos in the readout, None hides it"""
+		index = None
+		if pos is not None and self.candles is not None:
+			rect = self.plotRect()
+			start, end = self.xAxis.numericRange()
+			t = start + (pos.x() - rect.left()) / rect.width() * (end - start)
+			# Candles are drawn centred in their period
+			index = plotdata.nearest(self.candles.T, t - self.pyramid.period / 2.0)
+
+		if index == self._hoverIndex:
+			return
+		self._hoverIndex = index
+
+		if index is None:
+			self.readout.setVisible(False)
+			return
+
+		rect = self.plotRect()
+		self.readout.setText(self.readoutText(index))
+		self.readout.setPos(rect.left() + 5, rect.top() + 2)
+		self.readout.setVisible(True)
+
+	def readoutText(self, index):
+		c = self.candles
+		when = EPOCH + datetime.timedelta(seconds=int(c.T[index]))
+		return '%s  O %.8g  H %.8g  L %.8g  C %.8g  V %.8g' % (
+			when.strftime('%Y-%m-%d %H:%M'), c.O[index], c.H[index], c.L[index], c.C[index], c.V[index])
 
 	def enterEvent(self, event):
 		self.xAxis.setCursorPos(None)
 		self.yAxis.setCursorPos(None)
 
 	def leaveEvent(self, event):
-		self.xAxis.setCursorPos(None)
-		self.yAxis.setCursorPos(None)
-		QApplication.restoreOverrideCursor()
+		self.clearCursor()
 
 
 class Line(QGraphicsLineItem):
@@ -153,6 +360,7 @@ class Axis(QGraphicsLineItem):
 		self._datetime_fmt = "%d/%m %H:%M"
 
 		self._set_data_type()
+		self._set_float_format()
 
 		# Default values
 		self._divisionLength = 10
@@ -173,25 +381,30 @@ class Axis(QGraphicsLineItem):
 		self._cursorLength = 15
 		self._cursorOffset = self._divisionOffset
 
+		# Pools of tick items, update repositions and relabels them and only adds items when more are needed
 		self._divisions = []
 		self._subDivisions = []
 
+		# Label text keyed by (value, format) and label width keyed by text
+		self._textCache = {}
+		self._widthCache = {}
+		self._fontMetrics = None
+
 		x1 = self._view.graphOrigin.x()
 		y1 = self._view.graphOrigin.y()
 
 		if direction == self.HORIZONTAL:
 			divisionLine = QLineF(0, self._divisionOffset, 0, -self._divisionLength + self._divisionOffset)
+			self._subDivisionLine = QLineF(0, 0, 0, -self._subDivisionLength)
 			cursorLine = QLineF(0, 0, 0, -self._cursorLength)
 		else:
 			divisionLine = QLineF(-self._divisionOffset, 0, self._divisionLength - self._divisionOffset, 0)
+			self._subDivisionLine = QLineF(0, 0, self._subDivisionLength, 0)
 			cursorLine = QLineF(0, 0, self._cursorLength, 0)
+		self._divisionLine = divisionLine
 
-		if self._data_type in [self.INTEGER, self.FLOAT]:
-			startLineText = str(self._start_value)
-			endLineText = str(self._end_value)
-		else:
-			startLineText = self._start_value.strftime(self._datetime_fmt)
-			endLineText = self._end_value.strftime(self._datetime_fmt)
+		startLineText = self.endText(self._start_value)
+		endLineText = self.endText(self._end_value)
 
 		self.startLine = DivisionLine(divisionLine, parent=self, scene=self.scene())
 		self.startLine.setPos(x1, y1)
@@ -234,6 +447,46 @@ class Axis(QGraphicsLineItem):
 		else:
 			raise TypeError('Start and End values must be either datetime.datetime, in or float objects')
 
+	def _set_float_format(self):
+		# Decimals down to a hundredth of the span, BTC quoted prices need eight
+		decimals = 2
+		if self._data_type == self.FLOAT:
+			span = abs(self._end_value - self._start_value) or abs(self._end_value)
+			if span > 0:
+				decimals = min(10, max(0, 2 - int(math.floor(math.log10(span)))))
+
+		float_format = '%%.%02df' % decimals
+		if float_format != self._float_format:
+			self._float_format = float_format
+			self._textCache = {}
+
+	def endText(self, value):
+		return self.formatValue(value)
+
+	def setRange(self, start_value, end_value):
+		self._start_value = start_value
+		self._end_value = end_value
+		self._set_data_type()
+		self._set_float_format()
+
+		self.startLine.setText(self.endText(self._start_value))
+		self.endLine.setText(self.endText(self._end_value))
+		self.update()
+
+	def numericRange(self):
+		"""(start, end) as numbers, epoch seconds on a datetime axis"""
+		return self.toNumber(self._start_value), self.toNumber(self._end_value)
+
+	def toNumber(self, value):
+		if self._data_type == self.DATETIME:
+			return calendar.timegm(value.timetuple()) + value.microsecond / 1e6
+		return value
+
+	def fromNumber(self, number):
+		if self._data_type == self.DATETIME:
+			return EPOCH + datetime.timedelta(seconds=float(number))
+		return float(number)
+
 	def update(self):
 		# Calculate the line for the direction
 		x1 = self._view.graphOrigin.x()
@@ -256,16 +509,12 @@ class Axis(QGraphicsLineItem):
 
 		# Calculate the divisions
 		# Calculate the minimal division space
-		fmStart = self.startLine.fontMetrics()
-		fmEnd = self.startLine.fontMetrics()
-
 		if self._direction == self.HORIZONTAL:
-			minDivisionSpace = max([fmStart.width(self.divisionText(self._start_value, None, True)) + 15,
-									fmEnd.width(self.divisionText(self._end_value, None, True)) + 15,
+			minDivisionSpace = max([self.textWidth(self.divisionText(self._start_value, None, True)) + 15,
+									self.textWidth(self.divisionText(self._end_value, None, True)) + 15,
 									self._minDivisionSpace])
 		else:
-			minDivisionSpace = max([fmStart.height() + 15,
-									fmEnd.height() + 15,
+			minDivisionSpace = max([self.fontMetrics().height() + 15,
 									self._minDivisionSpace])
 
 		max_fittable_divisions = int(float(graphLength) / minDivisionSpace)
@@ -283,72 +532,90 @@ class Axis(QGraphicsLineItem):
 
 		subdivision_space = division_space / max(1, subDivisions)
 
-		for i in self._divisions:
-			i.scene().removeItem(i)
-			del i
-
-		self._divisions = []
-
-		# Draw the divisions
+		# Place the divisions, walking from the origin along the axis
 		if self._direction == self.HORIZONTAL:
-			divisionLine = QLineF(0, self._divisionOffset, 0, -self._divisionLength + self._divisionOffset)
-			subDivisionLine = QLineF(0, 0, 0, -self._subDivisionLength)
-
-			self.addSubdivisions(subDivisionLine, QPointF(x1 + self._view._graphOffsetX, y1), subDivisions, subdivision_space)
+			ox, oy = x1 + self._view._graphOffsetX, y1
+			dx, dy = 1, 0
 
-			self.startLine.setPos(x1 + self._view._graphOffsetX, y1)
-			self.endLine.setPos(x1 + self._view._graphOffsetX + graphLength, y1)
+			self.startLine.setPos(ox, oy)
+			self.endLine.setPos(ox + graphLength, oy)
+		else:
+			ox, oy = x1, y1 - self._view._graphOffsetY
+			dx, dy = 0, -1
 
-			for n in xrange(max(0, divisions - 1)):
-				p = QPointF(x1 + self._view._graphOffsetX + ((n + 1) * division_space), y2)
-				self.addDivision(divisionLine, p, self.divisionText(n + 1, divisions))
-				self.addSubdivisions(subDivisionLine, p, subDivisions, subdivision_space)
+			self.startLine.setPos(ox, oy)
+			self.endLine.setPos(ox, oy - graphLength)
 
-		else:
-			divisionLine = QLineF(-self._divisionOffset, 0, self._divisionLength - self._divisionOffset, 0)
-			subDivisionLine = QLineF(0, 0, self._subDivisionLength, 0)
+		majors = max(0, divisions - 1)
+		subs = max(0, subDivisions - 1)
+		minors = (majors + 1) * subs
 
-			self.startLine.setPos(x1, y1 - self._view._graphOffsetY)
-			self.endLine.setPos(x1, y1 - (self._view._graphOffsetY + graphLength))
+		self.growPool(self._divisions, majors, self._divisionLine)
+		self.growPool(self._subDivisions, minors, self._subDivisionLine)
 
-			self.addSubdivisions(subDivisionLine, QPointF(x1, y1 - self._view._graphOffsetY), subDivisions, subdivision_space)
+		for n, item in enumerate(self._divisions):
+			if n < majors:
+				d = (n + 1) * division_space
+				item.setPos(ox + dx * d, oy + dy * d)
+				item.setText(self.divisionText(n + 1, divisions))
+				item.setVisible(True)
+			else:
+				item.setVisible(False)
+
+		for n, item in enumerate(self._subDivisions):
+			if n < minors:
+				major, sub = divmod(n, subs)
+				d = major * division_space + (sub + 1) * subdivision_space
+				item.setPos(ox + dx * d, oy + dy * d)
+				item.setVisible(True)
+			else:
+				item.setVisible(False)
 
-			for n in xrange(max(0, divisions - 1)):
-				p = QPointF(x1, y1 - (self._view._graphOffsetY + ((n + 1) * division_space)))
-				self.addDivision(divisionLine, p, self.divisionText(n + 1, divisions))
-				self.addSubdivisions(subDivisionLine, p, subDivisions, subdivision_space)
+	def growPool(self, pool, count, line):
+		while len(pool) < count:
+			item = DivisionLine(line, parent=self, scene=self.scene())
+			item.setColor(self.pen().color())
+			pool.append(item)
 
-	def addDivision(self, line, p, text=None):
-		line = DivisionLine(line, parent=self, scene=self.scene())
-		line.setPos(p)
-		line.setColor(self.pen().color())
-		line.setText(text)
-		self._divisions.append(line)
+	def fontMetrics(self):
+		if self._fontMetrics is None:
+			self._fontMetrics = self.startLine.fontMetrics()
+		return self._fontMetrics
 
-	def addSubdivisions(self, line, p, subdivisions, space):
-		if self._direction == self.HORIZONTAL:
-			for n in xrange(max(0, subdivisions - 1)):
-				self.addDivision(line, QPointF(p.x() + ((n + 1) * space), p.y()))
-		else:
-			for n in xrange(max(0, subdivisions - 1)):
-				self.addDivision(line, QPointF(p.x(), p.y() - ((n + 1) * space)))
+	def textWidth(self, text):
+		width = self._widthCache.get(text)
+		if width is None:
+			width = self._widthCache[text] = self.fontMetrics().width(text)
+		return width
 
 	def divisionText(self, n, divisions, maxlength=False):
 		total = self._end_value - self._start_value
 		if self._data_type in [self.INTEGER, self.FLOAT]:
-			val = ((float(n) / float(divisions)) * total) + self._start_value
-			if not maxlength:
-				return (self._float_format % val).rstrip('0').rstrip('.')
-			else:
-				return self._float_format % val
-
+			val = n if divisions is None else ((float(n) / float(divisions)) * total) + self._start_value
+		elif not maxlength:
+			val = datetime.timedelta(seconds=((float(n) / float(divisions)) * total.total_seconds())) + self._start_value
 		else:
-			if not maxlength:
-				val = datetime.timedelta(seconds=((float(n) / float(divisions)) * total.total_seconds())) + self._start_value
-			else:
-				val = datetime.datetime.now()
+			# Widest label of the format, every field at two digits
+			val = datetime.datetime(2000, 12, 28, 23, 58)
+
+		return self.formatValue(val, maxlength)
+
+	def formatValue(self, value, maxlength=False):
+		key = (value, maxlength)
+		text = self._textCache.get(key)
+		if text is None:
+			if len(self._textCache) > 4096:
+				self._textCache.clear()
+			text = self._textCache[key] = self._format(value, maxlength)
+		return text
 
-			return val.strftime(self._datetime_fmt)
+	def _format(self, value, maxlength=False):
+		if self._data_type in [self.INTEGER, self.FLOAT]:
+			text = self._float_format % value
+			if not maxlength:
+				text = text.rstrip('0').rstrip('.')
+			return text
+		return value.strftime(self._datetime_fmt)
 
 	def setCursorPos(self, pos):
 		x1 = self._view.graphOrigin.x()
@@ -392,11 +659,269 @@ class Axis(QGraphicsLineItem):
 			return datetime.timedelta(seconds=mult * total.total_seconds()) + self._start_value
 
 	def valueToText(self, value):
-		if self._data_type in [self.INTEGER, self.FLOAT]:
-			return (self._float_format % value).rstrip('0').rstrip('.')
+		# Cursor values are new on every mouse move, caching them would only churn the cache
+		return self._format(value)
+
+
+class Series(QGraphicsItem):
+	"""Data drawn in the plot area of a Graph.
 
+	A series paints from arrays in a few batched calls per frame, never one
+	item per data point. What it draws is built once per view, the ranges
+	and size of the graph, and reused by repaints that keep the view.
+	"""
+
+	def __init__(self, graph):
+		super(Series, self).__init__()
+		self._graph = graph
+		self._viewKey = None
+		self._primitives = None
+		self.setZValue(-1)
+
+	def boundingRect(self):
+		return self._graph.plotRect()
+
+	def refresh(self):
+		"""Redraw after the data, the ranges or the size of the graph changed"""
+		self.prepareGeometryChange()
+		self._viewKey = None
+		self.update()
+
+	def paint(self, painter, option, widget=None):
+		rect = self._graph.plotRect()
+		start, end = self._graph.xAxis.numericRange()
+		low, high = self._graph.yAxis.numericRange()
+
+		key = (rect.left(), rect.top(), rect.width(), rect.height(), start, end, low, high)
+		if key != self._viewKey:
+			self._primitives = None
+			if end > start and high > low and rect.width() > 0 and rect.height() > 0:
+				self._primitives = self.build(rect, start, end, low, high)
+			self._viewKey = key
+
+		if self._primitives is not None:
+			painter.save()
+			painter.setClipRect(rect)
+			self.draw(painter, self._primitives)
+			painter.restore()
+
+	def build(self, rect, start, end, low, high):
+		"""What to draw for the view, handed to draw, None draws nothing"""
+		return None
+
+	def draw(self, painter, primitives):
+		pass
+
+
+class CandleSeries(Series):
+	def __init__(self, graph, up='#3FBF7F', down='#E5534B'):
+		super(CandleSeries, self).__init__(graph)
+		self.candles = None
+		self.pyramid = None
+		self.period = 60.0
+		self.upColor = QColor(up)
+		self.downColor = QColor(down)
+
+		# Narrower than this only the high-low wick is drawn
+		self.minBodyWidth = 3
+
+	def setData(self, candles, pyramid=None):
+		"""pyramid is a plotdata.Pyramid of candles, built here when not given"""
+		self.candles = candles
+		self.pyramid = pyramid if pyramid is not None else plotdata.Pyramid(candles)
+		self.period = self.pyramid.period
+		self.refresh()
+
+	def build(self, rect, start, end, low, high):
+		if self.candles is None:
+			return None
+
+		period, (T, O, H, L, C, V) = self.pyramid.decimate(start, end, rect.width())
+		xscale = rect.width() / float(end - start)
+		yscale = rect.height() / float(high - low)
+		bottom = rect.bottom()
+
+		x = rect.left() + (T - start + period / 2.0) * xscale
+		up = (C >= O).tolist()
+		yo, yh, yl, yc = [(bottom - (a - low) * yscale).tolist() for a in (O, H, L, C)]
+
+		wicks = {True: [], False: []}
+		bodies = {True: [], False: []}
+		width = 0.7 * period * xscale
+
+		for i, xi in enumerate(x.tolist()):
+			wicks[up[i]].append(QLineF(xi, yh[i], xi, yl[i]))
+			if width >= self.minBodyWidth:
+				top = min(yo[i], yc[i])
+				bodies[up[i]].append(QRectF(xi - width / 2.0, top, width, max(abs(yc[i] - yo[i]), 1.0)))
+
+		return wicks, bodies
+
+	def draw(self, painter, primitives):
+		wicks, bodies = primitives
+		for up, color in ((True, self.upColor), (False, self.downColor)):
+			painter.setPen(QPen(color))
+			if wicks[up]:
+				painter.drawLines(wicks[up])
+			if bodies[up]:
+				painter.setBrush(QBrush(color))
+				painter.drawRects(bodies[up])
+
+
+class VolumeSeries(Series):
+	def __init__(self, graph, color='#5F5F5F', height=0.2):
+		"""height is the part of the plot area the highest bar in view reaches"""
+		super(VolumeSeries, self).__init__(graph)
+		self.candles = None
+		self.pyramid = None
+		self.period = 60.0
+		self.color = QColor(color)
+		self.height = height
+
+	def setData(self, candles, pyramid=None):
+		self.candles = candles
+		self.pyramid = pyramid if pyramid is not None else plotdata.Pyramid(candles)
+		self.period = self.pyramid.period
+		self.refresh()
+
+	def build(self, rect, start, end, low, high):
+		if self.candles is None:
+			return None
+
+		period, (T, O, H, L, C, V) = self.pyramid.decimate(start, end, rect.width())
+		if not len(V) or not np.nanmax(V) > 0:
+			return None
+
+		xscale = rect.width() / float(end - start)
+		x = rect.left() + (T - start + period / 2.0) * xscale
+		heights = (np.nan_to_num(V) / np.nanmax(V) * rect.height() * self.height).tolist()
+		bottom = rect.bottom()
+		width = 0.7 * period * xscale
+
+		if width >= 2:
+			return [QRectF(xi - width / 2.0, bottom - h, width, h) for xi, h in zip(x.tolist(), heights)]
+		return [QLineF(xi, bottom, xi, bottom - h) for xi, h in zip(x.tolist(), heights)]
+
+	def draw(self, painter, primitives):
+		painter.setPen(QPen(self.color))
+		if isinstance(primitives[0], QRectF):
+			painter.setBrush(QBrush(self.color))
+			painter.drawRects(primitives)
 		else:
-			return value.strftime(self._datetime_fmt)
+			painter.drawLines(primitives)
+
+
+class LineSeries(Series):
+	def __init__(self, graph, t=None, y=None, color='#2CAFFF'):
+		super(LineSeries, self).__init__(graph)
+		self.t = None
+		self.y = None
+		self.color = QColor(color)
+		if t is not None:
+			self.setData(t, y)
+
+	def setData(self, t, y):
+		"""t are sorted epoch seconds, y the values"""
+		self.t = np.asarray(t)
+		self.y = np.asarray(y, dtype=np.float64)
+		self.refresh()
+
+	def build(self, rect, start, end, low, high):
+		if self.t is None:
+			return None
+
+		t, y = plotdata.decimate_line(self.t, self.y, start, end, rect.width())
+		if not len(t):
+			return None
+
+		x = (rect.left() + (t - start) * (rect.width() / float(end - start))).tolist()
+		y = (rect.bottom() - (y - low) * (rect.height() / float(high - low))).tolist()
+		return QPolygonF([QPointF(xi, yi) for xi, yi in zip(x, y)])
+
+	def draw(self, painter, primitives):
+		painter.setPen(QPen(self.color))
+		painter.drawPolyline(primitives)
+
+
+class TickWorker(QObject):
+	"""Fetches candles on a worker thread and emits the ones the chart doesn't have yet.
+
+	The GetTicks history is fetched once, then GetLatestTick every interval
+	seconds. The newest candle is emitted again while it is still forming,
+	a gap since the last poll fetches the history again.
+	"""
+	received = Signal(object)
+	failed = Signal(str)
+
+	def __init__(self, client, market, tickInterval='oneMin', interval=5.0):
+		super(TickWorker, self).__init__()
+		self.client = client
+		self.market = market
+		self.tickInterval = tickInterval
+		self.interval = interval
+		self.period = seconds(tickInterval)
+		self.last = None
+		self._timer = None
+
+	@Slot()
+	def start(self):
+		# Runs in the worker thread, so the timer and the requests do too
+		self._timer = QTimer()
+		self._timer.timeout.connect(self.poll)
+		self._timer.start(int(self.interval * 1000))
+		self.poll()
+
+	@Slot()
+	def poll(self):
+		try:
+			if self.last is None:
+				candles = self.client.GetTicks(self.market, self.tickInterval, columnar=True)
+			else:
+				candles = self.client.GetLatestTick(self.market, self.tickInterval, columnar=True)
+				if len(candles) and candles.T[0] > self.last + self.period:
+					candles = self.client.GetTicks(self.market, self.tickInterval, columnar=True)
+		except (RequestError, ResponseError, requests.RequestException) as e:
+			self.failed.emit(str(e))
+			return
+
+		if self.last is not None:
+			candles = candles[candles.index(self.last):]
+		if len(candles):
+			self.last = int(candles.T[-1])
+			self.received.emit(candles)
+
+
+class LiveFeed(QObject):
+	"""Shows a market live on a Graph.
+
+		feed = LiveFeed(graph, Bittrex(), 'BTC-ETH')
+		feed.start()
+
+	Requests run on a worker QThread, never on the GUI thread. The candles
+	reach the GUI thread through a queued signal and graph redraws at most
+	graph.frameRate times a second.
+	"""
+
+	def __init__(self, graph, client, market, tickInterval='oneMin', interval=5.0):
+		super(LiveFeed, self).__init__(graph)
+		self.graph = graph
+		self.thread = QThread(self)
+		self.worker = TickWorker(client, market, tickInterval, interval)
+		self.worker.moveToThread(self.thread)
+
+		self.thread.started.connect(self.worker.start)
+		self.worker.received.connect(graph.appendCandles, Qt.QueuedConnection)
+		self.worker.failed.connect(self.onFailed, Qt.QueuedConnection)
+
+	def start(self):
+		self.thread.start()
+
+	def stop(self):
+		self.thread.quit()
+		self.thread.wait()
+
+	def onFailed(self, message):
+		log.warning('Live feed of %s failed: %s', self.worker.market, message)
 
 
 class Particle(QGraphicsEllipseItem):
@@ -431,6 +956,7 @@ class DivisionLine(QGraphicsLineItem):
 		super(DivisionLine, self).__init__(*args, **kwargs)
 		self.text = ''
 		self.textItem = None
+		self._textWidth = None
 		self.textOffset = 5
 		self.backDropMargin = 3
 		self._backdropItem = None
@@ -450,7 +976,7 @@ class DivisionLine(QGraphicsLineItem):
 			self._backdropItem.scene().removeItem(self._backdropItem)
 			del self._backdropItem
 
-		if self.textItem:
+		if self.text:
 			rect = self.marginRect(self.mapFromScene(self.textItem.sceneBoundingRect()).boundingRect())
 		else:
 			rect = QRectF(0, 0, 0, 0)
@@ -460,32 +986,42 @@ class DivisionLine(QGraphicsLineItem):
 		self._backdropItem.setPen(Qt.NoPen)
 		self._backdropItem.setBrush(QBrush(color))
 
-		if not self.textItem:
+		if not self.text:
 			self._backdropItem.setVisible(False)
 
 
 	def setText(self, text):
-		if self.textItem is not None:
-			self.textItem.scene().removeItem(self.textItem)
-			del self.textItem
+		if text == self.text:
+			return
 
 		if text:
-			self.textItem = QGraphicsSimpleTextItem(text, parent=self)
-			self.textItem.setBrush(QBrush(self.pen().color()))
-			self.setTextAlignment(Qt.AlignCenter)
+			if self.textItem is None:
+				self.textItem = QGraphicsSimpleTextItem(text, parent=self)
+				self.textItem.setBrush(QBrush(self.pen().color()))
+			else:
+				self.textItem.setText(text)
+				self.textItem.setVisible(True)
+
+			# Alignment and backdrop only move when the width of the text changes
+			width = self.textItem.boundingRect().width()
+			if width != self._textWidth:
+				self._textWidth = width
+				self.setTextAlignment(Qt.AlignCenter)
+				if self._backdropItem:
+					self._backdropItem.setRect(self.marginRect(self.textItem.boundingRect().translated(self.textItem.pos())))
+
 			if self._backdropItem:
-				rect = self.marginRect(self.mapFromScene(self.textItem.sceneBoundingRect()).boundingRect())
-				self._backdropItem.setRect(rect)
 				self._backdropItem.setVisible(True)
 		else:
+			if self.textItem is not None:
+				self.textItem.setVisible(False)
 			if self._backdropItem:
 				self._backdropItem.setVisible(False)
-			self.textItem = None
 
 		self.text = text
 
 	def setTextAlignment(self, align):
-		rect = self.textItem.sceneBoundingRect()
+		rect = self.textItem.boundingRect()
 		if align == Qt.AlignCenter:
 			if self.direction == self.HORIZONTAL:
 				self.textItem.setPos(-(rect.width() + self.textOffset) + self.line().x1(), -rect.height() / 2.0)
@@ -525,7 +1061,14 @@ class DivisionLine(QGraphicsLineItem):
 if __name__ == '__main__':
 	app = QApplication(sys.argv)
 	dialog = Graph()
+	feed = None
+	if len(sys.argv) > 1:
+		# python graph.py BTC-ETH [tickInterval] shows a market live
+		feed = LiveFeed(dialog, Bittrex(), sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else 'oneMin')
+		feed.start()
 	dialog.show()
 	dialog.activateWindow()
 	dialog.raise_()
-	app.exec_()
\ No newline at end of file
+	app.exec_()
+	if feed is not None:
+		feed.stop()
\ No newline at end of file
@@ -0,0 +1,68 @@
+"""High-water marks for incremental history reads.
+
+Bittrex returns order, deposit and withdrawal histories newest first. A
+HistoryCursor remembers the newest record it has handed out per history, so
+the next read yields only the records that are newer and stops reading the
+response as soon as it reaches the mark.
+
+	cursor = HistoryCursor('marks.json')
+	for order in client.iter_order_history(cursor=cursor):
+		reconcile(order)
+"""
+import json
+import os
+
+# request_type -> (id field, time field) of its records
+FIELDS = {	'getorderhistory': ('OrderUuid', 'TimeStamp'),
+			'getdeposithistory': ('Id', 'LastUpdated'),
+			'getwithdrawalhistory': ('PaymentUuid', 'Opened')}
+
+
+class HistoryCursor(object):
+	def __init__(self, path=None):
+		"""path is a json file the marks are kept in between runs, memory only without it"""
+		self.path = path
+		self.marks = {}
+
+		if path is not None and os.path.exists(path):
+			with open(path) as f:
+				self.marks = json.load(f)
+
+	def key(self, request_type, parameters):
+		return '|'.join([request_type] + ['%s=%s' % kv for kv in sorted(parameters.items())])
+
+	def new(self, request_type, records, **parameters):
+		"""Yield the records that are newer than the mark, newest first.
+
+		The mark moves to the newest record once the iteration is finished,
+		abandoning it halfway leaves the mark where it was.
+		"""
+		id_field, time_field = FIELDS[request_type]
+		key = self.key(request_type, parameters)
+		mark = self.marks.get(key)
+
+		newest = None
+		for record in records:
+			if mark is not None:
+				timestamp = record.get(time_field)
+				if record.get(id_field) == mark['id'] or (timestamp is not None and mark['time'] is not None
+															and timestamp < mark['time']):
+					# Stop reading the response, the rest has been seen before
+					records.close()
+					break
+			if newest is None:
+				newest = record
+			yield record
+
+		if newest is not None:
+			self.marks[key] = {'id': newest.get(id_field), 'time': newest.get(time_field)}
+			self.save()
+
+	def save(self):
+		if self.path is None:
+			return
+
+		tmp = self.path + '.tmp'
+		with open(tmp, 'w') as f:
+			json.dump(self.marks, f)
+		os.replace(tmp, self.path)
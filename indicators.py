@@ -0,0 +1,279 @@
+"""Vectorized indicators over candle arrays, requires numpy.
+
+All functions take arrays shaped (markets, time), or just (time,) for a
+single market, and return arrays of the same shape with NaN where the
+window isn't filled yet. stack lines up the Candles of many markets into
+such arrays.
+
+IndicatorEngine computes a set of indicators for every market in one pass
+and then keeps them current when a new candle is appended, without going
+over the whole window again:
+
+	engine = IndicatorEngine([('sma', 20), ('ema', 12), ('rsi', 14), ('bollinger', 20, 2), ('vwap',)])
+	values = engine.compute(stack(candles))
+	latest = engine.update(new_candles)
+"""
+import numpy as np
+
+
+def stack(candles, fields=('H', 'L', 'C', 'V')):
+	"""dict of (markets, time) arrays from a list of Candles, aligned on their last candle.
+
+	Shorter histories are padded with NaN at the start.
+	"""
+	length = max(len(c) for c in candles) if candles else 0
+	arrays = {}
+	for field in fields:
+		array = np.full((len(candles), length), np.nan)
+		for i, c in enumerate(candles):
+			if len(c):
+				array[i, length - len(c):] = getattr(c, field)
+		arrays[field] = array
+	return arrays
+
+
+def _window_diff(c, n):
+	out = np.full(c.shape, np.nan)
+	if c.shape[-1] >= n:
+		out[..., n - 1] = c[..., n - 1]
+		out[..., n:] = c[..., n:] - c[..., :-n]
+	return out
+
+
+def _rolling_sum(x, n):
+	"""Sum of the last n values, NaN until a window holds n valid values"""
+	valid = ~np.isnan(x)
+	out = _window_diff(np.cumsum(np.where(valid, x, 0), axis=-1), n)
+	out[_window_diff(np.cumsum(valid, axis=-1), n) < n] = np.nan
+	return out
+
+
+def sma(x, n):
+	return _rolling_sum(np.asarray(x, dtype=np.float64), n) / n
+
+
+def _smooth(x, n, alpha):
+	"""Exponential smoothing along time, every row seeded with the mean of its first n valid values"""
+	rows = x.reshape(-1, x.shape[-1])
+	length = rows.shape[1]
+	out = np.full(rows.shape, np.nan)
+
+	valid = ~np.isnan(rows)
+	first = np.where(valid.any(axis=1), valid.argmax(axis=1), length)
+	seed = first + n - 1
+	seeded = np.flatnonzero(seed < length)
+	if not len(seeded):
+		return out.reshape(x.shape)
+
+	prev = np.full(len(rows), np.nan)
+	for row in seeded:
+		prev[row] = rows[row, seed[row] - n + 1:seed[row] + 1].mean()
+	for t in range(seed[seeded].min(), length):
+		prev = np.where(t > seed, alpha * rows[:, t] + (1 - alpha) * prev, prev)
+		out[:, t] = np.where(t >= seed, prev, np.nan)
+	return out.reshape(x.shape)
+
+
+def ema(x, n):
+	return _smooth(np.asarray(x, dtype=np.float64), n, 2.0 / (n + 1))
+
+
+def _rsi(avg_gain, avg_loss):
+	with np.errstate(divide='ignore', invalid='ignore'):
+		return np.where(avg_loss == 0, 100.0, 100.0 - 100.0 / (1.0 + avg_gain / avg_loss))
+
+
+def _changes(close):
+	"""Gain and loss from the previous close, NaN for the first"""
+	change = np.full(close.shape, np.nan)
+	change[..., 1:] = np.diff(close, axis=-1)
+	return np.maximum(change, 0), np.maximum(-change, 0)
+
+
+def _wilder(close, n):
+	"""Average gain and loss, Wilder smoothing is exponential smoothing with alpha 1/n"""
+	gain, loss = _changes(close)
+	return _smooth(gain, n, 1.0 / n), _smooth(loss, n, 1.0 / n)
+
+
+def rsi(close, n=14):
+	"""Wilder's relative strength index"""
+	return _rsi(*_wilder(np.asarray(close, dtype=np.float64), n))
+
+
+def bollinger(close, n=20, k=2.0):
+	"""(middle, upper, lower) bands"""
+	close = np.asarray(close, dtype=np.float64)
+	mean = _rolling_sum(close, n) / n
+	variance = np.maximum(_rolling_sum(close * close, n) / n - mean * mean, 0)
+	deviation = k * np.sqrt(variance)
+	return mean, mean + deviation, mean - deviation
+
+
+def vwap(high, low, close, volume, n=None):
+	"""Volume weighted average of the typical price, cumulative or over the last n candles"""
+	typical = (np.asarray(high, dtype=np.float64) + low + close) / 3.0
+	volume = np.asarray(volume, dtype=np.float64)
+	if n is None:
+		# NaN padding adds nothing, the average starts at the first candle of every row
+		pv, v = np.nancumsum(typical * volume, axis=-1), np.nancumsum(volume, axis=-1)
+	else:
+		pv, v = _rolling_sum(typical * volume, n), _rolling_sum(volume, n)
+	with np.errstate(divide='ignore', invalid='ignore'):
+		return pv / v
+
+
+def name(spec):
+	"""Output name of an indicator spec, ('sma', 20) is sma20"""
+	return spec[0] + ''.join(str(a) for a in spec[1:])
+
+
+class _Window(object):
+	"""The last n values per market with their running sum and sum of squares, NaN left out"""
+
+	def __init__(self, x, n):
+		self.n = n
+		self.values = np.full((len(x), n), np.nan)
+		if x.shape[1]:
+			self.values[:, -min(n, x.shape[1]):] = x[:, -n:]
+		self.position = 0
+		valid = ~np.isnan(self.values)
+		filled = np.where(valid, self.values, 0)
+		self.count = valid.sum(axis=1)
+		self.sum = filled.sum(axis=1)
+		self.squares = (filled * filled).sum(axis=1)
+
+	def push(self, value):
+		old = self.values[:, self.position]
+		new_valid, old_valid = ~np.isnan(value), ~np.isnan(old)
+		value_filled, old_filled = np.where(new_valid, value, 0), np.where(old_valid, old, 0)
+		self.count += new_valid.astype(int) - old_valid.astype(int)
+		self.sum += value_filled - old_filled
+		self.squares += value_filled * value_filled - old_filled * old_filled
+		self.values[:, self.position] = value
+		self.position = (self.position + 1) % self.n
+
+	@property
+	def total(self):
+		"""Sum per market, NaN where the window doesn't hold n valid values"""
+		return np.where(self.count == self.n, self.sum, np.nan)
+
+
+class _Smoothing(object):
+	"""Latest exponentially smoothed value per market.
+
+	Markets that didn't have n values yet collect them and are seeded with
+	their mean once the n-th arrives, like _smooth does.
+	"""
+
+	def __init__(self, x, smoothed, n, alpha):
+		self.n = n
+		self.alpha = alpha
+		self.value = smoothed[:, -1].copy()
+		valid = ~np.isnan(x)
+		self.count = valid.sum(axis=1)
+		self.sum = np.where(valid, x, 0).sum(axis=1)
+
+	def push(self, x):
+		seeding = np.isnan(self.value) & ~np.isnan(x) & (self.count < self.n)
+		self.count += seeding
+		self.sum += np.where(seeding, x, 0)
+
+		value = self.alpha * x + (1 - self.alpha) * self.value
+		seeded = seeding & (self.count == self.n)
+		value[seeded] = self.sum[seeded] / self.n
+		self.value = value
+		return value
+
+
+class IndicatorEngine(object):
+	SPECS = ('sma', 'ema', 'rsi', 'bollinger', 'vwap')
+
+	def __init__(self, specs):
+		for spec in specs:
+			if spec[0] not in self.SPECS:
+				raise ValueError('Unknown indicator %r, choose from %s' % (spec[0], ', '.join(self.SPECS)))
+		self.specs = [tuple(spec) for spec in specs]
+		self.state = {}
+
+	def compute(self, data):
+		"""All indicators over data, a dict of (markets, time) H, L, C and V arrays like stack returns.
+
+		Also primes the state update continues from.
+		"""
+		high, low, close, volume = [np.atleast_2d(np.asarray(data[f], dtype=np.float64)) for f in ('H', 'L', 'C', 'V')]
+		results = {}
+		self.state = {'close': close[:, -1].copy()}
+
+		for spec in self.specs:
+			kind, args = spec[0], spec[1:]
+			key = name(spec)
+
+			if kind == 'sma':
+				results[key] = sma(close, *args)
+				self.state[key] = _Window(close, args[0])
+			elif kind == 'ema':
+				results[key] = ema(close, *args)
+				self.state[key] = _Smoothing(close, results[key], args[0], 2.0 / (args[0] + 1))
+			elif kind == 'rsi':
+				n = args[0] if args else 14
+				gains, losses = _changes(close)
+				gain, loss = _smooth(gains, n, 1.0 / n), _smooth(losses, n, 1.0 / n)
+				results[key] = _rsi(gain, loss)
+				self.state[key] = (_Smoothing(gains, gain, n, 1.0 / n), _Smoothing(losses, loss, n, 1.0 / n))
+			elif kind == 'bollinger':
+				results[key] = bollinger(close, *args)
+				self.state[key] = _Window(close, args[0] if args else 20)
+			elif kind == 'vwap':
+				typical = (high + low + close) / 3.0
+				if args:
+					results[key] = vwap(high, low, close, volume, *args)
+					self.state[key] = (_Window(typical * volume, args[0]), _Window(volume, args[0]))
+				else:
+					results[key] = vwap(high, low, close, volume)
+					self.state[key] = (np.nansum(typical * volume, axis=1), np.nansum(volume, axis=1))
+
+		return results
+
+	def update(self, candle):
+		"""Append one candle per market, a dict of H, L, C and V arrays shaped (markets,).
+
+		Returns the latest value of every indicator per market.
+		"""
+		high, low, close, volume = [np.asarray(candle[f], dtype=np.float64) for f in ('H', 'L', 'C', 'V')]
+		previous = self.state['close']
+		latest = {}
+
+		for spec in self.specs:
+			kind, args = spec[0], spec[1:]
+			key = name(spec)
+			state = self.state[key]
+
+			if kind == 'sma':
+				state.push(close)
+				latest[key] = state.total / state.n
+			elif kind == 'ema':
+				latest[key] = state.push(close)
+			elif kind == 'rsi':
+				change = close - previous
+				latest[key] = _rsi(state[0].push(np.maximum(change, 0)), state[1].push(np.maximum(-change, 0)))
+			elif kind == 'bollinger':
+				k = args[1] if len(args) > 1 else 2.0
+				state.push(close)
+				mean = state.total / state.n
+				deviation = k * np.sqrt(np.maximum(state.squares / state.n - mean * mean, 0))
+				latest[key] = (mean, mean + deviation, mean - deviation)
+			elif kind == 'vwap':
+				pv = (high + low + close) / 3.0 * volume
+				if args:
+					state[0].push(pv)
+					state[1].push(volume)
+					pv_sum, v_sum = state[0].total, state[1].total
+				else:
+					pv_sum, v_sum = state[0] + pv, state[1] + volume
+					self.state[key] = (pv_sum, v_sum)
+				with np.errstate(divide='ignore', invalid='ignore'):
+					latest[key] = pv_sum / v_sum
+
+		self.state['close'] = close
+		return latest
@@ -0,0 +1,164 @@
+"""Request metrics for the Bittrex client.
+
+A Metrics instance is a client hook: Bittrex(hooks=[metrics]) calls it with
+a RequestEvent after every request. It keeps per-endpoint histograms of the
+connect, wait, download and decode time, error counters by type and status
+or message, and counters of the bytes sent and received.
+
+Exporters turn the collected metrics into something to publish, snapshot
+returns plain dicts and prometheus the Prometheus text exposition format.
+"""
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+PHASES = ('connect', 'wait', 'download', 'decode')
+
+# Upper bounds in seconds of the histogram buckets
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestEvent(object):
+	"""What a client hook gets to see of one request"""
+	__slots__ = ('endpoint', 'url', 'status', 'timings', 'bytes_out', 'bytes_in', 'error')
+
+	def __init__(self, endpoint, url, status=None, timings=None, bytes_out=0, bytes_in=0, error=None):
+		self.endpoint = endpoint
+		self.url = url
+		self.status = status
+		# Seconds per phase, phases that weren't measured are missing
+		self.timings = timings or {}
+		self.bytes_out = bytes_out
+		self.bytes_in = bytes_in
+		self.error = error
+
+
+class Histogram(object):
+	__slots__ = ('buckets', 'counts', 'sum', 'count')
+
+	def __init__(self, buckets=BUCKETS):
+		self.buckets = buckets
+		self.counts = [0] * (len(buckets) + 1)
+		self.sum = 0.0
+		self.count = 0
+
+	def observe(self, value):
+		self.counts[bisect_left(self.buckets, value)] += 1
+		self.sum += value
+		self.count += 1
+
+	def cumulative(self):
+		"""(upper bound, cumulative count) pairs, the last bound is infinite"""
+		total = 0
+		pairs = []
+		for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+			total += count
+			pairs.append((bound, total))
+		return pairs
+
+
+def error_reason(error):
+	"""Status code of a RequestError, message of a ResponseError, class name otherwise"""
+	if hasattr(error, 'status_code'):
+		return str(error.status_code)
+	if hasattr(error, 'message'):
+		return str(error.message)
+	return type(error).__name__
+
+
+class Metrics(object):
+	def __init__(self, buckets=BUCKETS):
+		self.buckets = buckets
+		self.histograms = {}
+		self.errors = defaultdict(int)
+		self.requests = defaultdict(int)
+		self.bytes_out = defaultdict(int)
+		self.bytes_in = defaultdict(int)
+		self._lock = threading.Lock()
+
+	def __call__(self, event):
+		self.record(event)
+
+	def record(self, event):
+		endpoint = event.endpoint
+		with self._lock:
+			self.requests[endpoint] += 1
+			self.bytes_out[endpoint] += event.bytes_out
+			self.bytes_in[endpoint] += event.bytes_in
+
+			for phase, seconds in event.timings.items():
+				key = (endpoint, phase)
+				histogram = self.histograms.get(key)
+				if histogram is None:
+					histogram = self.histograms[key] = Histogram(self.buckets)
+				histogram.observe(seconds)
+
+			if event.error is not None:
+				self.errors[(endpoint, type(event.error).__name__, error_reason(event.error))] += 1
+
+	def export(self, exporter):
+		with self._lock:
+			return exporter(self)
+
+	def snapshot(self):
+		return self.export(snapshot)
+
+	def prometheus(self):
+		return self.export(prometheus)
+
+
+def snapshot(metrics):
+	"""Metrics as plain dicts, keyed by endpoint"""
+	endpoints = {}
+	for endpoint, count in metrics.requests.items():
+		endpoints[endpoint] = {	'requests': count,
+								'bytes_out': metrics.bytes_out[endpoint],
+								'bytes_in': metrics.bytes_in[endpoint],
+								'timings': {},
+								'errors': {}}
+
+	for (endpoint, phase), h in metrics.histograms.items():
+		endpoints[endpoint]['timings'][phase] = {	'count': h.count,
+													'sum': h.sum,
+													'mean': h.sum / h.count if h.count else 0.0,
+													'buckets': h.cumulative()}
+
+	for (endpoint, kind, reason), count in metrics.errors.items():
+		endpoints[endpoint]['errors'][(kind, reason)] = count
+
+	return endpoints
+
+
+def _labels(**labels):
+	return '{%s}' % ','.join('%s="%s"' % (k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+							for k, v in sorted(labels.items()))
+
+
+def prometheus(metrics, prefix='bittrex'):
+	"""Metrics in the Prometheus text exposition format"""
+	lines = [	'# HELP %s_request_phase_seconds Time spent per request phase.' % prefix,
+				'# TYPE %s_request_phase_seconds histogram' % prefix]
+	for (endpoint, phase), h in sorted(metrics.histograms.items()):
+		for bound, count in h.cumulative():
+			le = '+Inf' if bound == float('inf') else repr(bound)
+			lines.append('%s_request_phase_seconds_bucket%s %d' % (prefix, _labels(endpoint=endpoint, phase=phase, le=le), count))
+		lines.append('%s_request_phase_seconds_sum%s %r' % (prefix, _labels(endpoint=endpoint, phase=phase), h.sum))
+		lines.append('%s_request_phase_seconds_count%s %d' % (prefix, _labels(endpoint=endpoint, phase=phase), h.count))
+
+	lines += [	'# HELP %s_requests_total Requests sent.' % prefix,
+				'# TYPE %s_requests_total counter' % prefix]
+	for endpoint, count in sorted(metrics.requests.items()):
+		lines.append('%s_requests_total%s %d' % (prefix, _labels(endpoint=endpoint), count))
+
+	lines += [	'# HELP %s_errors_total Failed requests by error type and status code or message.' % prefix,
+				'# TYPE %s_errors_total counter' % prefix]
+	for (endpoint, kind, reason), count in sorted(metrics.errors.items()):
+		lines.append('%s_errors_total%s %d' % (prefix, _labels(endpoint=endpoint, type=kind, reason=reason), count))
+
+	lines += [	'# HELP %s_bytes_total Bytes sent and received.' % prefix,
+				'# TYPE %s_bytes_total counter' % prefix]
+	for endpoint in sorted(metrics.requests):
+		lines.append('%s_bytes_total%s %d' % (prefix, _labels(endpoint=endpoint, direction='out'), metrics.bytes_out[endpoint]))
+		lines.append('%s_bytes_total%s %d' % (prefix, _labels(endpoint=endpoint, direction='in'), metrics.bytes_in[endpoint]))
+
+	return '\n'.join(lines) + '\n'
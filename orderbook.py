@@ -0,0 +1,199 @@
+"""Locally maintained order books.
+
+An OrderBook is seeded from a getorderbook snapshot and kept current by
+applying deltas in the format of the Bittrex exchange state updates:
+
+	{'MarketName': 'BTC-ETH', 'Nonce': 12,
+	 'Buys': [{'Type': 0, 'Rate': 0.07, 'Quantity': 1.5}, ...],
+	 'Sells': [...], 'Fills': [...]}
+
+where Type is ADD, REMOVE or UPDATE. A delta with 'Snapshot' set is a whole
+QueryExchangeState result and replaces the book. Deltas come from an update
+source, anything with an updates(market) method returning the deltas
+received since the last call, like ReplayFeed or streaming.MarketStream.
+"""
+import heapq
+from collections import defaultdict, deque
+
+ADD = 0
+REMOVE = 1
+UPDATE = 2
+
+
+class BookSide(object):
+	"""Price levels of one side of a book.
+
+	A heap keeps the prices best first, prices that are gone are dropped when
+	they reach its top. Iteration walks the heap best first without sorting
+	it, so reading the best few levels costs about as much as that many pops.
+	"""
+
+	def __init__(self, bids):
+		self.bids = bids
+		self.clear()
+
+	def clear(self):
+		self.levels = {}
+		self._heap = []
+
+	def _key(self, price):
+		return -price if self.bids else price
+
+	def set(self, price, quantity):
+		"""Set the quantity of a price level, a quantity of 0 removes the level"""
+		levels = self.levels
+		if quantity > 0:
+			if price not in levels:
+				heapq.heappush(self._heap, (self._key(price), price))
+			levels[price] = quantity
+		elif price in levels:
+			del levels[price]
+
+		if len(self._heap) > 2 * len(levels) + 64:
+			# Mostly stale entries, start over from the live levels
+			self._heap = [(self._key(p), p) for p in levels]
+			heapq.heapify(self._heap)
+
+	def best(self):
+		"""(price, quantity) of the best level, None if the side is empty"""
+		heap, levels = self._heap, self.levels
+		while heap and heap[0][1] not in levels:
+			heapq.heappop(heap)
+		if not heap:
+			return None
+		price = heap[0][1]
+		return price, levels[price]
+
+	def __iter__(self):
+		"""(price, quantity) levels, best first"""
+		heap, levels = self._heap, self.levels
+		if not heap:
+			return
+
+		# The children of a heap entry come after it, a second heap holds the entries that can come next
+		frontier = [(heap[0], 0)]
+		seen = set()
+		while frontier:
+			entry, i = heapq.heappop(frontier)
+			for child in (2 * i + 1, 2 * i + 2):
+				if child < len(heap):
+					heapq.heappush(frontier, (heap[child], child))
+
+			price = entry[1]
+			# Skip removed levels and the duplicates of levels removed and added again
+			if price in levels and price not in seen:
+				seen.add(price)
+				yield price, levels[price]
+
+	def __len__(self):
+		return len(self.levels)
+
+	def depth(self, price=None, levels=None):
+		"""Cumulative quantity up to and including price, or of the best levels"""
+		total = 0.0
+		for n, (p, quantity) in enumerate(self):
+			if levels is not None and n >= levels:
+				break
+			if price is not None and (p < price if self.bids else p > price):
+				break
+			total += quantity
+		return total
+
+	def vwap(self, size):
+		"""Volume weighted average price of taking size from this side, None if the book is too thin"""
+		remaining = size
+		cost = 0.0
+		for price, quantity in self:
+			take = min(remaining, quantity)
+			cost += take * price
+			remaining -= take
+			if remaining <= 0:
+				return cost / size
+		return None
+
+
+class OrderBook(object):
+	def __init__(self, market, source=None):
+		self.market = market
+		self.source = source
+		self.bids = BookSide(bids=True)
+		self.asks = BookSide(bids=False)
+		self.nonce = None
+		self.fills = deque(maxlen=1000)
+
+	def seed(self, snapshot, nonce=None):
+		"""Replace the book with a getorderbook 'both' snapshot"""
+		self.bids.clear()
+		self.asks.clear()
+		for level in snapshot.get('buy') or ():
+			self.bids.set(level['Rate'], level['Quantity'])
+		for level in snapshot.get('sell') or ():
+			self.asks.set(level['Rate'], level['Quantity'])
+		self.nonce = nonce
+
+	def seed_state(self, state):
+		"""Replace the book with a QueryExchangeState result"""
+		self.seed({'buy': state.get('Buys'), 'sell': state.get('Sells')}, state.get('Nonce'))
+
+	def apply(self, delta):
+		"""Apply an exchange state delta, returns False if it was older than the book"""
+		if delta.get('Snapshot'):
+			self.seed_state(delta)
+			return True
+
+		nonce = delta.get('Nonce')
+		if nonce is not None and self.nonce is not None and nonce <= self.nonce:
+			return False
+
+		for side, changes in ((self.bids, delta.get('Buys')), (self.asks, delta.get('Sells'))):
+			for change in changes or ():
+				if change['Type'] == REMOVE:
+					side.set(change['Rate'], 0)
+				else:
+					side.set(change['Rate'], change['Quantity'])
+
+		self.fills.extend(delta.get('Fills') or ())
+
+		if nonce is not None:
+			self.nonce = nonce
+		return True
+
+	def sync(self):
+		"""Apply the deltas the source received since the last sync"""
+		if self.source is not None:
+			for delta in self.source.updates(self.market):
+				self.apply(delta)
+		return self
+
+	def best_bid(self):
+		return self.bids.best()
+
+	def best_ask(self):
+		return self.asks.best()
+
+	def spread(self):
+		bid, ask = self.bids.best(), self.asks.best()
+		if bid is None or ask is None:
+			return None
+		return ask[0] - bid[0]
+
+	def vwap(self, side, size):
+		"""VWAP of buying ('buy', taking asks) or selling ('sell', taking bids) size"""
+		return (self.asks if side == 'buy' else self.bids).vwap(size)
+
+
+class ReplayFeed(object):
+	"""Update source that hands out deltas pushed to it, e.g. replayed from a recording"""
+
+	def __init__(self, deltas=()):
+		self._queues = defaultdict(deque)
+		for delta in deltas:
+			self.push(delta)
+
+	def push(self, delta):
+		self._queues[delta['MarketName']].append(delta)
+
+	def updates(self, market):
+		queue = self._queues[market]
+		while queue:
+			yield queue.popleft()
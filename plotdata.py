@@ -0,0 +1,205 @@
+"""Screen-sized views of long histories for graph.py, requires numpy.
+
+A chart can't show more than one value per pixel column, so the decimate
+functions reduce the samples of a time range to at most one entry per
+column before anything is drawn. Candles keep the open of the first, the
+close of the last, the highest high and lowest low of their column and the
+summed volume. Lines keep the first, lowest, highest and last sample of
+every column, drawn as a polyline that looks the same as all the samples.
+
+Pyramid keeps a long candle history at several resolutions, every level
+merging factor candles of the one below, so a frame only touches about as
+many candles as there are pixel columns at any zoom.
+
+Times are sorted epoch seconds like candles.Candles.T.
+"""
+import numpy as np
+
+from candles import Candles, FIELDS
+
+
+def spacing(t):
+	"""Typical spacing of the sorted times t"""
+	if len(t) < 2:
+		return 60.0
+	return float(np.median(np.diff(t[:1001])))
+
+
+def column_bounds(t, start, end, width):
+	"""(lo, hi) sample index ranges of the pixel columns over [start, end] that have samples"""
+	width = max(1, int(width))
+	edges = np.linspace(start, end, width + 1)
+	bounds = np.searchsorted(t, edges, side='left')
+	bounds[-1] = np.searchsorted(t, end, side='right')
+
+	lo, hi = bounds[:-1], bounds[1:]
+	filled = hi > lo
+	return lo[filled], hi[filled]
+
+
+def _reduce(ufunc, values, lo, hi):
+	# The filled columns cover one contiguous run of samples
+	return ufunc.reduceat(values[lo[0]:hi[-1]], lo - lo[0])
+
+
+def visible(t, start, end):
+	"""slice of the samples within [start, end]"""
+	return slice(int(np.searchsorted(t, start, side='left')), int(np.searchsorted(t, end, side='right')))
+
+
+def nearest(t, value):
+	"""Index of the sample of the sorted times t closest to value, None when t is empty"""
+	n = len(t)
+	if not n:
+		return None
+	i = int(np.searchsorted(t, value))
+	if i == 0:
+		return 0
+	if i == n:
+		return n - 1
+	return i if t[i] - value < value - t[i - 1] else i - 1
+
+
+def decimate_ohlc(candles, start, end, width):
+	"""Candles within [start, end] merged per pixel column.
+
+	Returns (T, O, H, L, C, V) arrays, T is the time of the first candle of
+	every column. NaN prices of gaps are skipped.
+	"""
+	lo, hi = column_bounds(candles.T, start, end, width)
+	if not len(lo):
+		empty = np.empty(0)
+		return candles.T[:0], empty, empty, empty, empty, empty
+
+	return (candles.T[lo],
+			candles.O[lo],
+			_reduce(np.fmax, candles.H, lo, hi),
+			_reduce(np.fmin, candles.L, lo, hi),
+			candles.C[hi - 1],
+			_reduce(np.add, candles.V, lo, hi))
+
+
+def decimate_line(t, y, start, end, width):
+	"""First, lowest, highest and last sample per pixel column, returns (t, y) with four points per column"""
+	y = np.asarray(y, dtype=np.float64)
+	lo, hi = column_bounds(t, start, end, width)
+	if not len(lo):
+		return t[:0], y[:0]
+
+	points = np.empty((len(lo), 4))
+	points[:, 0] = y[lo]
+	points[:, 1] = _reduce(np.fmin, y, lo, hi)
+	points[:, 2] = _reduce(np.fmax, y, lo, hi)
+	points[:, 3] = y[hi - 1]
+	return np.repeat(t[lo], 4), points.ravel()
+
+
+def value_range(low, high, t, start, end):
+	"""(lowest low, highest high) of the samples within [start, end], None without any"""
+	window = visible(t, start, end)
+	if window.start >= window.stop:
+		return None
+	with np.errstate(invalid='ignore'):
+		lowest, highest = np.nanmin(low[window]), np.nanmax(high[window])
+	if np.isnan(lowest) or np.isnan(highest):
+		return None
+	return float(lowest), float(highest)
+
+
+def merge(candles, factor):
+	"""Every factor consecutive candles merged into one"""
+	starts = np.arange(0, len(candles), factor)
+	ends = np.minimum(starts + factor, len(candles)) - 1
+	return Candles(	candles.T[starts],
+					candles.O[starts],
+					np.fmax.reduceat(candles.H, starts),
+					np.fmin.reduceat(candles.L, starts),
+					candles.C[ends],
+					np.add.reduceat(candles.V, starts),
+					np.add.reduceat(candles.BV, starts))
+
+
+class Pyramid(object):
+	"""A candle history at decreasing resolutions.
+
+		pyramid = Pyramid(candles)
+		period, (T, O, H, L, C, V) = pyramid.decimate(start, end, width)
+
+	Level 0 is the history itself. A view reads the coarsest level that
+	still has a candle for every pixel column, its highs, lows and volumes
+	are exact, merged candles only lose detail that would share a column.
+
+	extend adds live candles. Every level lives in arrays with room to grow,
+	only the merged candles above the new ones are computed again.
+	"""
+
+	def __init__(self, candles, factor=4, minimum=256):
+		self.factor = factor
+		self.minimum = minimum
+		self.period = spacing(candles.T)
+		self.levels = []
+		self._buffers = []
+		self._write(0, 0, candles)
+		while len(self.levels[-1]) > minimum:
+			self._write(len(self.levels), 0, merge(self.levels[-1], factor))
+
+	def _write(self, level, at, candles):
+		"""Put candles into level from position at on, dropping what was after"""
+		size = at + len(candles)
+		if level == len(self._buffers):
+			self._buffers.append(None)
+
+		buffers = self._buffers[level]
+		if buffers is None or len(buffers[0]) < size:
+			capacity = max(size + size // 2, 64)
+			grown = [np.empty(capacity, dtype=getattr(candles, f).dtype) for f in FIELDS]
+			if buffers is not None:
+				for old, new in zip(buffers, grown):
+					new[:at] = old[:at]
+			buffers = self._buffers[level] = grown
+
+		for buffer, f in zip(buffers, FIELDS):
+			buffer[at:size] = getattr(candles, f)
+
+		view = Candles(*[buffer[:size] for buffer in buffers])
+		if level == len(self.levels):
+			self.levels.append(view)
+		else:
+			self.levels[level] = view
+
+	def extend(self, candles):
+		"""Add newer candles, one at the time of the last candle replaces it"""
+		if not len(candles):
+			return
+
+		first = self.levels[0].index(candles.T[0])
+		self._write(0, first, candles)
+
+		for level in range(1, len(self.levels)):
+			first //= self.factor
+			below = self.levels[level - 1]
+			self._write(level, first, merge(below[first * self.factor:], self.factor))
+
+		while len(self.levels[-1]) > self.minimum:
+			self._write(len(self.levels), 0, merge(self.levels[-1], self.factor))
+
+	def __len__(self):
+		return len(self.levels[0])
+
+	def level(self, start, end, width):
+		"""Index of the level to draw [start, end] from at width pixels"""
+		window = visible(self.levels[0].T, start, end)
+		count = window.stop - window.start
+		level = 0
+		while level + 1 < len(self.levels) and count >= width * self.factor ** (level + 1):
+			level += 1
+		return level
+
+	def decimate(self, start, end, width):
+		"""(candle period of the level, decimate_ohlc of it)"""
+		level = self.level(start, end, width)
+		return self.period * self.factor ** level, decimate_ohlc(self.levels[level], start, end, width)
+
+	def value_range(self, start, end, width):
+		candles = self.levels[self.level(start, end, width)]
+		return value_range(candles.L, candles.H, candles.T, start, end)
@@ -0,0 +1,98 @@
+"""Many API keys behind one connection pool.
+
+	pool = BittrexPool({'scalper': (key, secret), 'swing': (key2, secret2)},
+						ip_rate_limits={'public': 10}, key_rate_limits={'market': 5})
+	pool['scalper'].buy_limit('BTC-ETH', 1, 0.07)
+	balances = pool.balances()		# every account in parallel
+
+Every account gets its own Bittrex client, all of them share one session and
+transport. Rate limits are tracked per key and for the whole IP: each client's
+scheduler has the IP-wide scheduler as parent.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from bittrex import Bittrex, BatchResult, RequestError, ResponseError, create_session
+from ratelimit import Scheduler
+from transport import RequestsTransport
+
+
+class BittrexPool(object):
+	def __init__(self, credentials, ip_rate_limits=None, key_rate_limits=None, timeout=10,
+				pool_connections=10, pool_maxsize=10, max_retries=0, backoff_factor=0,
+				max_workers=None, **kwargs):
+		"""
+		credentials maps an account name to a (key, secret) tuple. Other keyword
+		arguments are passed on to every Bittrex client.
+		"""
+		self.session = create_session(pool_connections, pool_maxsize, max_retries, backoff_factor)
+		self.transport = RequestsTransport(self.session, timeout)
+		self.scheduler = Scheduler(ip_rate_limits)
+		self.max_workers = max_workers or pool_maxsize
+		self._executor = None
+
+		def client(key=None, secret=None):
+			return Bittrex(	key, secret, session=self.session, transport=self.transport, timeout=timeout,
+							scheduler=Scheduler(key_rate_limits, parent=self.scheduler), **kwargs)
+
+		# Public requests only count against the IP
+		self.public = Bittrex(session=self.session, transport=self.transport, timeout=timeout,
+							scheduler=self.scheduler, **kwargs)
+		self.clients = dict((name, client(key, secret)) for name, (key, secret) in credentials.items())
+
+	def __getitem__(self, account):
+		return self.clients[account]
+
+	def __contains__(self, account):
+		return account in self.clients
+
+	def __len__(self):
+		return len(self.clients)
+
+	def accounts(self):
+		return sorted(self.clients)
+
+	def call(self, account, method, *args, **kwargs):
+		"""Call a client method with the key of account"""
+		return getattr(self.clients[account], method)(*args, **kwargs)
+
+	def each(self, method, *args, **kwargs):
+		"""Call a client method for every account in parallel, returns a BatchResult keyed by account"""
+		if self._executor is None:
+			self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+
+		futures = [(name, self._executor.submit(getattr(client, method), *args, **kwargs))
+					for name, client in self.clients.items()]
+
+		results = BatchResult()
+		for name, future in futures:
+			try:
+				results[name] = future.result()
+			except (RequestError, ResponseError, requests.RequestException) as e:
+				results.errors[name] = e
+
+		return results
+
+	def balances(self):
+		return self.each('balances')
+
+	def open_orders(self, market=None):
+		return self.each('open_orders', market)
+
+	def order_history(self, market=None):
+		return self.each('order_history', market)
+
+	def close(self):
+		if self._executor is not None:
+			self._executor.shutdown()
+			self._executor = None
+		for client in self.clients.values():
+			client.close()
+		self.public.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
@@ -0,0 +1,138 @@
+"""Client-side rate limiting for the Bittrex client.
+
+A Scheduler holds a token bucket per endpoint group. Requests wait in a
+priority queue per group, so an order placement is let through before the
+market data requests that were queued ahead of it.
+"""
+import heapq
+import itertools
+import threading
+import time
+
+# Priorities, lower goes first
+HIGH = 0
+NORMAL = 5
+LOW = 10
+
+
+class TokenBucket(object):
+	def __init__(self, rate, capacity=None):
+		"""rate is in requests per second, capacity is the allowed burst"""
+		if rate <= 0:
+			raise ValueError('rate should be positive, recieved %r' % rate)
+
+		self.rate = float(rate)
+		self.capacity = float(capacity if capacity is not None else max(1, rate))
+		self.tokens = self.capacity
+		self.updated = time.monotonic()
+
+	def refill(self, now):
+		self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+		self.updated = now
+
+	def delay(self, now):
+		"""Seconds until a token is available"""
+		self.refill(now)
+		if self.tokens >= 1:
+			return 0
+		return (1 - self.tokens) / self.rate
+
+	def take(self):
+		self.tokens -= 1
+
+
+class GroupStats(object):
+	__slots__ = ('requests', 'wait', 'max_wait')
+
+	def __init__(self):
+		self.requests = 0
+		self.wait = 0.0
+		self.max_wait = 0.0
+
+	def as_dict(self, queued):
+		return {'queued': queued,
+				'requests': self.requests,
+				'wait': self.wait,
+				'max_wait': self.max_wait,
+				'mean_wait': self.wait / self.requests if self.requests else 0.0}
+
+
+class Scheduler(object):
+	def __init__(self, limits=None, parent=None):
+		"""
+		limits maps an endpoint group ('public', 'account', 'market', 'pub',
+		'auth') to a rate in requests per second or a (rate, capacity) tuple.
+		Groups without a limit are not throttled. A parent scheduler, if given,
+		is acquired as well, e.g. to share an IP-wide limit between clients.
+		"""
+		self.parent = parent
+		self._buckets = {}
+		self._queues = {}
+		self._stats = {}
+		self._counter = itertools.count()
+		self._condition = threading.Condition()
+
+		for group, limit in (limits or {}).items():
+			self.set_limit(group, *(limit if isinstance(limit, tuple) else (limit,)))
+
+	def set_limit(self, group, rate, capacity=None):
+		with self._condition:
+			self._buckets[group] = TokenBucket(rate, capacity)
+			self._queues.setdefault(group, [])
+			self._stats.setdefault(group, GroupStats())
+			self._condition.notify_all()
+
+	def throttles(self, group):
+		return group in self._buckets or (self.parent is not None and self.parent.throttles(group))
+
+	def acquire(self, group, priority=NORMAL):
+		"""Block until a request of group may be sent, returns the seconds waited"""
+		start = time.monotonic()
+		bucket = self._buckets.get(group)
+
+		if bucket is not None:
+			queue = self._queues[group]
+			stats = self._stats[group]
+
+			with self._condition:
+				entry = (priority, next(self._counter))
+				heapq.heappush(queue, entry)
+				self._condition.notify_all()
+
+				try:
+					while True:
+						if queue[0] is entry:
+							delay = bucket.delay(time.monotonic())
+							if delay <= 0:
+								bucket.take()
+								break
+							self._condition.wait(delay)
+						else:
+							self._condition.wait()
+				finally:
+					queue.remove(entry)
+					heapq.heapify(queue)
+					self._condition.notify_all()
+
+		if self.parent is not None:
+			self.parent.acquire(group, priority)
+
+		waited = time.monotonic() - start
+
+		if bucket is not None:
+			with self._condition:
+				stats.requests += 1
+				stats.wait += waited
+				stats.max_wait = max(stats.max_wait, waited)
+
+		return waited
+
+	def queue_depth(self, group=None):
+		with self._condition:
+			if group is not None:
+				return len(self._queues.get(group, ()))
+			return sum(len(q) for q in self._queues.values())
+
+	def stats(self):
+		with self._condition:
+			return dict((group, stats.as_dict(len(self._queues[group]))) for group, stats in self._stats.items())
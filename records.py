@@ -0,0 +1,206 @@
+"""Compact typed results.
+
+With Bittrex(typed=True) tickers, market summaries and orders come back as
+Ticker, MarketSummary and Order records instead of dicts. Records keep
+their fields in __slots__ under the Bittrex names and read like the dicts
+they replace:
+
+	summary.Last, summary['Last'], summary.get('PrevDay')
+
+Timestamp fields hold the raw string until they are read, the first read
+parses it into a datetime. Fields a response doesn't have are None, fields
+a record doesn't know are dropped.
+
+SummaryTable keeps a whole market_summaries snapshot as numpy columns, one
+array per field instead of one object per market, requires numpy.
+"""
+import datetime
+
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
+
+def parse_time(text):
+	"""Bittrex timestamp string to datetime, like Bittrex.timestamp_to_datetime"""
+	if text is None:
+		return None
+	return datetime.datetime.strptime(text.split('.')[0], '%Y-%m-%dT%H:%M:%S')
+
+
+class _Time(object):
+	"""Timestamp field, the raw string lives in slot _<field> until the first read parses it"""
+
+	def __init__(self, field):
+		self.raw = '_' + field
+		self.parsed = '_' + field + '_parsed'
+
+	def __get__(self, record, cls):
+		if record is None:
+			return self
+		try:
+			return getattr(record, self.parsed)
+		except AttributeError:
+			value = parse_time(getattr(record, self.raw))
+			setattr(record, self.parsed, value)
+			return value
+
+
+def _slots(fields, times):
+	return tuple('_' + f if f in times else f for f in fields) + tuple('_%s_parsed' % f for f in times)
+
+
+class Record(object):
+	__slots__ = ()
+	FIELDS = ()
+	TIMES = ()
+
+	def __init__(self, data):
+		get = data.get
+		for field, slot in self._ASSIGN:
+			setattr(self, slot, get(field))
+
+	def __getitem__(self, field):
+		if field not in self.FIELDS:
+			raise KeyError(field)
+		return getattr(self, field)
+
+	def __contains__(self, field):
+		return field in self.FIELDS
+
+	def get(self, field, default=None):
+		return getattr(self, field) if field in self.FIELDS else default
+
+	def keys(self):
+		return list(self.FIELDS)
+
+	def raw(self, field):
+		"""The field as it came in, timestamps unparsed"""
+		return getattr(self, '_' + field if field in self.TIMES else field)
+
+	def to_dict(self):
+		return dict((field, self.raw(field)) for field in self.FIELDS)
+
+	def __eq__(self, other):
+		return type(self) is type(other) and self.to_dict() == other.to_dict()
+
+	def __ne__(self, other):
+		return not self == other
+
+	__hash__ = None
+
+	def __repr__(self):
+		return '%s(%s)' % (type(self).__name__, ', '.join('%s=%r' % (f, self.raw(f)) for f in self.FIELDS[:3]))
+
+
+class Ticker(Record):
+	FIELDS = ('Bid', 'Ask', 'Last')
+	__slots__ = FIELDS
+	_ASSIGN = tuple(zip(FIELDS, FIELDS))
+
+
+class MarketSummary(Record):
+	FIELDS = (	'MarketName', 'High', 'Low', 'Volume', 'Last', 'BaseVolume', 'TimeStamp', 'Bid', 'Ask',
+				'OpenBuyOrders', 'OpenSellOrders', 'PrevDay', 'Created')
+	TIMES = ('TimeStamp', 'Created')
+	__slots__ = _slots(FIELDS, TIMES)
+	_ASSIGN = tuple(zip(FIELDS, __slots__))
+
+	TimeStamp = _Time('TimeStamp')
+	Created = _Time('Created')
+
+
+class Order(Record):
+	"""getorder, getopenorders and getorderhistory records"""
+	FIELDS = (	'OrderUuid', 'Exchange', 'OrderType', 'Type', 'Quantity', 'QuantityRemaining', 'Limit',
+				'Reserved', 'ReserveRemaining', 'CommissionReserved', 'CommissionReserveRemaining',
+				'CommissionPaid', 'Commission', 'Price', 'PricePerUnit', 'TimeStamp', 'Opened', 'Closed',
+				'IsOpen', 'CancelInitiated', 'ImmediateOrCancel', 'IsConditional', 'Condition',
+				'ConditionTarget', 'AccountId', 'Sentinel', 'Uuid')
+	TIMES = ('TimeStamp', 'Opened', 'Closed')
+	__slots__ = _slots(FIELDS, TIMES)
+	_ASSIGN = tuple(zip(FIELDS, __slots__))
+
+	TimeStamp = _Time('TimeStamp')
+	Opened = _Time('Opened')
+	Closed = _Time('Closed')
+
+
+# request_type -> record of its result
+TYPES = {	'getticker': Ticker,
+			'getmarketsummaries': MarketSummary,
+			'getmarketsummary': MarketSummary,
+			'getorder': Order,
+			'getopenorders': Order,
+			'getorderhistory': Order}
+
+
+def convert(record, result):
+	"""result as records, a list stays a list"""
+	if record is None or result is None:
+		return result
+	if isinstance(result, list):
+		return [record(data) for data in result]
+	return record(result)
+
+
+class SummaryTable(object):
+	"""A market_summaries snapshot as columns.
+
+		table = SummaryTable(client.market_summaries())
+		table.Last						# float64 array, one price per market
+		table.Last[table.index('BTC-ETH')]
+		table['BTC-ETH']				# the row as a MarketSummary
+
+	Timestamps stay strings until timestamps() parses a whole column at once.
+	"""
+	__slots__ = ('markets', 'columns', 'times', '_index', '_parsed')
+
+	PRICES = ('High', 'Low', 'Volume', 'Last', 'BaseVolume', 'Bid', 'Ask', 'PrevDay')
+	COUNTS = ('OpenBuyOrders', 'OpenSellOrders')
+	TIMES = ('TimeStamp', 'Created')
+
+	def __init__(self, summaries):
+		if np is None:
+			raise ImportError('SummaryTable requires numpy')
+
+		self.markets = [s.get('MarketName') for s in summaries]
+		# None becomes NaN, Decimal and Fixed amounts become floats
+		self.columns = dict((f, np.array([s.get(f) for s in summaries], dtype=np.float64)) for f in self.PRICES)
+		self.columns.update((f, np.array([s.get(f) or 0 for s in summaries], dtype=np.int32)) for f in self.COUNTS)
+		self.times = dict((f, [s.raw(f) if hasattr(s, 'raw') else s.get(f) for s in summaries]) for f in self.TIMES)
+		self._index = None
+		self._parsed = {}
+
+	def __len__(self):
+		return len(self.markets)
+
+	def __getattr__(self, field):
+		try:
+			return self.columns[field]
+		except KeyError:
+			raise AttributeError(field)
+
+	def index(self, market):
+		if self._index is None:
+			self._index = dict((market, i) for i, market in enumerate(self.markets))
+		return self._index[market]
+
+	def __getitem__(self, market):
+		i = self.index(market)
+		data = dict((f, column[i].item()) for f, column in self.columns.items())
+		data.update((f, column[i]) for f, column in self.times.items())
+		data['MarketName'] = market
+		return MarketSummary(data)
+
+	def timestamps(self, field='TimeStamp'):
+		"""datetime64[ms] array of a timestamp column, parsed on first use"""
+		if field not in self._parsed:
+			self._parsed[field] = np.array(self.times[field], dtype='datetime64[ms]')
+		return self._parsed[field]
+
+	@property
+	def nbytes(self):
+		"""Bytes held by the numeric columns"""
+		return sum(column.nbytes for column in self.columns.values())
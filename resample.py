@@ -0,0 +1,154 @@
+"""Build coarser candles from one-minute candles.
+
+resample aggregates a whole candles.Candles history at once, Resampler does
+the same one candle at a time and keeps every derived interval current when
+a new minute candle arrives. Intervals are the GetTicks names ('fiveMin',
+'hour', ...), a number of seconds, or strings like '15m', '4h' and '1d'.
+
+Intervals without any source candle are gaps. With fill='ffill' they get a
+flat candle at the previous close and zero volume, with fill='nan' NaN prices
+and zero volume, and with fill=None they are left out.
+"""
+import re
+
+import numpy as np
+
+from candles import Candles
+from candlestore import parse_timestamp
+
+INTERVALS = {	'oneMin': 60,
+				'fiveMin': 300,
+				'thirtyMin': 1800,
+				'hour': 3600,
+				'day': 86400}
+
+UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def seconds(interval):
+	"""Length of interval in seconds"""
+	if isinstance(interval, int):
+		return interval
+	if interval in INTERVALS:
+		return INTERVALS[interval]
+
+	match = re.match(r'^(\d+)([smhd])$', interval)
+	if not match:
+		raise ValueError('Unknown interval %r' % (interval,))
+	return int(match.group(1)) * UNITS[match.group(2)]
+
+
+def _gap(t, close, fill):
+	price = close if fill == 'ffill' else np.nan
+	return (t, price, price, price, price, 0.0, 0.0)
+
+
+def resample(candles, interval, fill='ffill'):
+	"""Aggregate Candles into interval candles, returns Candles"""
+	period = seconds(interval)
+	if not len(candles):
+		return Candles.empty()
+
+	bucket = candles.T // period * period
+	starts = np.concatenate(([0], np.flatnonzero(np.diff(bucket)) + 1))
+	ends = np.concatenate((starts[1:], [len(bucket)])) - 1
+
+	T = bucket[starts]
+	O = candles.O[starts]
+	H = np.maximum.reduceat(candles.H, starts)
+	L = np.minimum.reduceat(candles.L, starts)
+	C = candles.C[ends]
+	V = np.add.reduceat(candles.V, starts)
+	BV = np.add.reduceat(candles.BV, starts)
+
+	if fill is None or len(T) == len(np.arange(T[0], T[-1] + 1, period)):
+		return Candles(T, O, H, L, C, V, BV)
+
+	full = np.arange(T[0], T[-1] + 1, period, dtype=np.int64)
+	present = np.searchsorted(full, T)
+
+	# Every interval gets the close of the last present candle at or before it
+	last = np.zeros(len(full), dtype=np.int64)
+	last[present] = present
+	last = np.maximum.accumulate(last)
+	close = np.full(len(full), np.nan)
+	close[present] = C
+
+	price = close[last] if fill == 'ffill' else np.full(len(full), np.nan)
+	columns = dict((f, price.copy()) for f in ('O', 'H', 'L', 'C'))
+	columns['V'] = np.zeros(len(full))
+	columns['BV'] = np.zeros(len(full))
+
+	for f, values in (('O', O), ('H', H), ('L', L), ('C', C), ('V', V), ('BV', BV)):
+		columns[f][present] = values
+
+	return Candles(full, **columns)
+
+
+def resample_all(candles, intervals, fill='ffill'):
+	"""Every interval from one history, keyed by interval"""
+	return dict((interval, resample(candles, interval, fill)) for interval in intervals)
+
+
+class Resampler(object):
+	"""Streaming resampler for many intervals at once.
+
+		r = Resampler(['15m', 'hour', '4h'], callback=on_candle)
+		r.update(minute_candle)		# calls on_candle(interval, candle) for every finished candle
+
+	Candles are (T, O, H, L, C, V, BV) tuples with T in epoch seconds, raw
+	GetTicks dicts are accepted by update as well. Source candles have to
+	arrive in order, a candle not newer than the previous one is ignored.
+	"""
+
+	def __init__(self, intervals, callback=None, fill='ffill'):
+		self.intervals = list(intervals)
+		self.periods = dict((interval, seconds(interval)) for interval in self.intervals)
+		self.callback = callback
+		self.fill = fill
+		self.last = None
+		self._current = dict((interval, None) for interval in self.intervals)
+
+	def current(self, interval):
+		"""The unfinished candle of interval, None before the first update"""
+		bar = self._current[interval]
+		return tuple(bar) if bar is not None else None
+
+	def update(self, candle):
+		"""Add a source candle, returns the (interval, candle) pairs it finished"""
+		if isinstance(candle, dict):
+			t = candle['T'] if isinstance(candle['T'], int) else parse_timestamp(candle['T'])
+			candle = (t, candle['O'], candle['H'], candle['L'], candle['C'], candle['V'], candle['BV'])
+
+		t, o, h, l, c, v, bv = candle
+		if self.last is not None and t <= self.last:
+			return []
+		self.last = t
+
+		finished = []
+		for interval in self.intervals:
+			period = self.periods[interval]
+			start = t // period * period
+			bar = self._current[interval]
+
+			if bar is not None and bar[0] == start:
+				bar[2] = max(bar[2], h)
+				bar[3] = min(bar[3], l)
+				bar[4] = c
+				bar[5] += v
+				bar[6] += bv
+				continue
+
+			if bar is not None:
+				finished.append((interval, tuple(bar)))
+				if self.fill is not None:
+					for gap in range(bar[0] + period, start, period):
+						finished.append((interval, _gap(gap, bar[4], self.fill)))
+
+			self._current[interval] = [start, o, h, l, c, v, bv]
+
+		if self.callback is not None:
+			for interval, bar in finished:
+				self.callback(interval, bar)
+
+		return finished
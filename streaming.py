@@ -0,0 +1,399 @@
+"""Push market data from the Bittrex SignalR socket, requires aiohttp.
+
+MarketStream subscribes to the corehub of socket.bittrex.com and hands out
+summary deltas, order book deltas and fills as they arrive, either to
+callbacks or through async iteration:
+
+	stream = MarketStream()
+	stream.subscribe('BTC-ETH')
+	stream.subscribe_summaries()
+	stream.on('fill', print)
+
+	async with stream:
+		async for message in stream:
+			print(message.kind, message.market)
+
+The connection is re-established when it drops, subscriptions are renewed
+and every subscribed book is queried again, so a 'snapshot' message follows
+every reconnect. MarketStream is also an update source for
+orderbook.OrderBook, snapshots replace the book and deltas are applied on
+top of it:
+
+	client = Bittrex(book_source=stream)
+	book = client.local_order_book('BTC-ETH')
+
+LocalHub is a stand-in for the socket server to test against.
+"""
+import asyncio
+import json
+import itertools
+import logging
+from collections import defaultdict
+
+import aiohttp
+from aiohttp import web
+
+from decoders import get_decoder
+from orderbook import ReplayFeed
+
+log = logging.getLogger(__name__)
+
+SOCKET = 'https://socket.bittrex.com/signalr'
+HUB = 'corehub'
+PROTOCOL = '1.5'
+
+KINDS = ('summary', 'exchange', 'fill', 'snapshot')
+
+# Queued by close, ends the iteration of whoever is waiting for a message
+_CLOSED = object()
+
+
+class Message(object):
+	__slots__ = ('kind', 'market', 'data')
+
+	def __init__(self, kind, market, data):
+		self.kind = kind
+		self.market = market
+		self.data = data
+
+	def __repr__(self):
+		return 'Message(%r, %r)' % (self.kind, self.market)
+
+
+class InvocationError(Exception):
+	def __init__(self, method, message):
+		super(InvocationError, self).__init__('%s failed: %s' % (method, message))
+		self.method = method
+		self.message = message
+
+
+class MarketStream(object):
+	def __init__(self, url=SOCKET, hub=HUB, decoder=None, timeout=10,
+				reconnect_delay=0.5, max_reconnect_delay=30, session=None):
+		"""
+		A dropped connection is retried after reconnect_delay seconds, doubling
+		up to max_reconnect_delay while it keeps failing.
+		"""
+		self.url = url.rstrip('/')
+		self.hub = hub
+		self.decode = get_decoder(decoder)
+		self.timeout = timeout
+		self.reconnect_delay = reconnect_delay
+		self.max_reconnect_delay = max_reconnect_delay
+		self.session = session
+		self._own_session = session is None
+
+		self.markets = []
+		self.summaries = False
+		self.callbacks = defaultdict(list)
+		self.feed = ReplayFeed()
+		self.connects = 0
+
+		self._queue = None
+		self._ws = None
+		self._task = None
+		self._closed = False
+		self._invocations = itertools.count()
+		self._pending = {}
+		# market -> deltas received while its QueryExchangeState is in flight
+		self._syncing = {}
+
+	def subscribe(self, market):
+		"""Stream the order book deltas and fills of market"""
+		if market not in self.markets:
+			self.markets.append(market)
+			if self._ws is not None:
+				asyncio.ensure_future(self._subscribe(market))
+
+	def subscribe_summaries(self):
+		"""Stream the summary deltas of every market"""
+		if not self.summaries:
+			self.summaries = True
+			if self._ws is not None:
+				asyncio.ensure_future(self.invoke('SubscribeToSummaryDeltas'))
+
+	def on(self, kind, callback):
+		"""Call callback(market, data) for every message of kind"""
+		if kind not in KINDS:
+			raise ValueError('Unknown message kind %r, choose from %s' % (kind, ', '.join(KINDS)))
+		self.callbacks[kind].append(callback)
+
+	def updates(self, market):
+		"""Deltas and snapshots of market received since the last call, see orderbook.OrderBook.sync"""
+		return self.feed.updates(market)
+
+	def emit(self, kind, market, data):
+		for callback in self.callbacks.get(kind, ()):
+			callback(market, data)
+		if self._queue is not None:
+			self._queue.put_nowait(Message(kind, market, data))
+
+	def dispatch(self, data):
+		"""Handle one decoded socket frame"""
+		if 'I' in data:
+			future = self._pending.pop(data['I'], None)
+			if future is not None and not future.done():
+				if 'E' in data:
+					future.set_exception(InvocationError(future.method, data['E']))
+				else:
+					future.set_result(data.get('R'))
+			return
+
+		for call in data.get('M') or ():
+			method = call['M'].lower()
+			for arg in call['A']:
+				if method == 'updateexchangestate':
+					market = arg['MarketName']
+					if market in self._syncing:
+						self._syncing[market].append(arg)
+					else:
+						self.feed.push(arg)
+					self.emit('exchange', market, arg)
+					for fill in arg.get('Fills') or ():
+						self.emit('fill', market, fill)
+				elif method == 'updatesummarystate':
+					for delta in arg['Deltas']:
+						self.emit('summary', delta['MarketName'], delta)
+
+	async def invoke(self, method, *args):
+		"""Call a hub method, returns its result"""
+		ws = self._ws
+		if ws is None:
+			raise ConnectionError('Not connected')
+
+		invocation = str(next(self._invocations))
+		future = asyncio.get_event_loop().create_future()
+		future.method = method
+		self._pending[invocation] = future
+
+		await ws.send_str(json.dumps({'H': self.hub, 'M': method, 'A': list(args), 'I': invocation}))
+		try:
+			return await asyncio.wait_for(future, self.timeout)
+		finally:
+			self._pending.pop(invocation, None)
+
+	async def _subscribe(self, market):
+		# Deltas wait until the snapshot is in the feed, or the snapshot would replace newer ones
+		self._syncing[market] = pending = []
+		try:
+			await self.invoke('SubscribeToExchangeDeltas', market)
+			state = await self.invoke('QueryExchangeState', market)
+		finally:
+			self._syncing.pop(market, None)
+
+		if state is None:
+			for delta in pending:
+				self.feed.push(delta)
+			return
+
+		# The query result has no market name, it goes through the feed as a snapshot delta
+		state = dict(state, MarketName=market, Snapshot=True)
+		self.feed.push(state)
+		for delta in pending:
+			if delta['Nonce'] > state['Nonce']:
+				self.feed.push(delta)
+		self.emit('snapshot', market, state)
+
+	async def _resync(self):
+		if self.summaries:
+			await self.invoke('SubscribeToSummaryDeltas')
+		for market in list(self.markets):
+			await self._subscribe(market)
+
+	def _parameters(self, **parameters):
+		parameters.update(clientProtocol=PROTOCOL, connectionData=json.dumps([{'name': self.hub}]))
+		return parameters
+
+	async def connect(self):
+		"""Connect once, subscribe and read until the connection drops"""
+		if self.session is None or self.session.closed:
+			self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout))
+
+		async with self.session.get(self.url + '/negotiate', params=self._parameters()) as r:
+			r.raise_for_status()
+			token = self.decode(await r.read())['ConnectionToken']
+
+		parameters = self._parameters(transport='webSockets', connectionToken=token)
+		ws_url = 'ws' + self.url[len('http'):] + '/connect'
+
+		async with self.session.ws_connect(ws_url, params=parameters, timeout=self.timeout,
+											autoping=True, max_msg_size=0) as ws:
+			async with self.session.get(self.url + '/start', params=parameters) as r:
+				r.raise_for_status()
+
+			self._ws = ws
+			self.connects += 1
+			reader = asyncio.ensure_future(self._read(ws))
+			try:
+				await self._resync()
+				await reader
+			finally:
+				reader.cancel()
+				self._ws = None
+				for future in self._pending.values():
+					if not future.done():
+						future.set_exception(ConnectionError('Connection lost'))
+				self._pending.clear()
+
+	async def _read(self, ws):
+		decode = self.decode
+		async for frame in ws:
+			if frame.type == aiohttp.WSMsgType.TEXT:
+				data = decode(frame.data)
+				if data:
+					self.dispatch(data)
+			elif frame.type == aiohttp.WSMsgType.ERROR:
+				break
+
+	async def run(self):
+		"""Keep connected until close, reconnecting with backoff"""
+		delay = self.reconnect_delay
+		while not self._closed:
+			connects = self.connects
+			try:
+				await self.connect()
+			except asyncio.CancelledError:
+				raise
+			except (aiohttp.ClientError, ConnectionError, InvocationError, asyncio.TimeoutError, ValueError) as e:
+				log.warning('Socket error: %r', e)
+
+			if self._closed:
+				break
+			if self.connects > connects:
+				delay = self.reconnect_delay
+			log.info('Reconnecting in %.1fs', delay)
+			await asyncio.sleep(delay)
+			delay = min(delay * 2, self.max_reconnect_delay)
+
+	def start(self):
+		if self._task is None:
+			self._closed = False
+			self._task = asyncio.ensure_future(self.run())
+		return self._task
+
+	async def close(self):
+		self._closed = True
+		if self._queue is not None:
+			self._queue.put_nowait(_CLOSED)
+		if self._ws is not None:
+			await self._ws.close()
+		if self._task is not None:
+			self._task.cancel()
+			try:
+				await self._task
+			except asyncio.CancelledError:
+				pass
+			self._task = None
+		if self._own_session and self.session is not None:
+			await self.session.close()
+
+	async def __aenter__(self):
+		self.start()
+		return self
+
+	async def __aexit__(self, *exc):
+		await self.close()
+
+	def __aiter__(self):
+		# Messages are only queued once somebody iterates
+		if self._queue is None:
+			self._queue = asyncio.Queue()
+		return self
+
+	async def __anext__(self):
+		if self._closed and self._queue.empty():
+			raise StopAsyncIteration
+		message = await self._queue.get()
+		if message is _CLOSED:
+			# Left for any other consumer
+			self._queue.put_nowait(message)
+			raise StopAsyncIteration
+		return message
+
+
+class LocalHub(object):
+	"""Stand-in for the Bittrex socket server on localhost.
+
+		hub = LocalHub(states={'BTC-ETH': {'Nonce': 1, 'Buys': [...], 'Sells': [...], 'Fills': []}})
+		await hub.start()
+		stream = MarketStream(hub.url)
+		await hub.publish('updateExchangeState', delta)
+		await hub.drop()		# close every connection, the stream reconnects
+	"""
+
+	def __init__(self, states=None, host='127.0.0.1', port=0):
+		self.states = states or {}
+		self.host = host
+		self.port = port
+		self.sockets = []
+		self.invocations = []
+		self._runner = None
+
+		self.app = web.Application()
+		self.app.router.add_get('/signalr/negotiate', self.negotiate)
+		self.app.router.add_get('/signalr/start', self.start_transport)
+		self.app.router.add_get('/signalr/connect', self.connect)
+
+	@property
+	def url(self):
+		return 'http://%s:%d/signalr' % (self.host, self.port)
+
+	async def start(self):
+		self._runner = web.AppRunner(self.app)
+		await self._runner.setup()
+		site = web.TCPSite(self._runner, self.host, self.port)
+		await site.start()
+		self.port = site._server.sockets[0].getsockname()[1]
+		return self
+
+	async def stop(self):
+		await self.drop()
+		if self._runner is not None:
+			await self._runner.cleanup()
+			self._runner = None
+
+	async def __aenter__(self):
+		return await self.start()
+
+	async def __aexit__(self, *exc):
+		await self.stop()
+
+	async def negotiate(self, request):
+		return web.json_response({'ConnectionToken': 'token', 'ConnectionId': 'local',
+									'ProtocolVersion': PROTOCOL, 'TryWebSockets': True})
+
+	async def start_transport(self, request):
+		return web.json_response({'Response': 'started'})
+
+	async def connect(self, request):
+		ws = web.WebSocketResponse()
+		await ws.prepare(request)
+		self.sockets.append(ws)
+		try:
+			async for frame in ws:
+				if frame.type == aiohttp.WSMsgType.TEXT:
+					await self.invoke(ws, json.loads(frame.data))
+		finally:
+			if ws in self.sockets:
+				self.sockets.remove(ws)
+		return ws
+
+	async def invoke(self, ws, call):
+		self.invocations.append((call['M'], call['A']))
+		if call['M'] == 'QueryExchangeState':
+			result = self.states.get(call['A'][0])
+		else:
+			result = True
+		await ws.send_str(json.dumps({'R': result, 'I': call['I']}))
+
+	async def publish(self, method, *args):
+		"""Send a hub call to every connected client"""
+		frame = json.dumps({'C': 'local', 'M': [{'H': 'CoreHub', 'M': method, 'A': list(args)}]})
+		for ws in list(self.sockets):
+			await ws.send_str(frame)
+
+	async def drop(self):
+		"""Close every client connection"""
+		for ws in list(self.sockets):
+			await ws.close()
+		self.sockets = []
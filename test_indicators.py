@@ -0,0 +1,69 @@
+import numpy as np
+
+from candles import Candles
+from indicators import IndicatorEngine, stack, sma, ema, rsi, bollinger, vwap
+
+SPECS = [('sma', 20), ('ema', 12), ('rsi', 14), ('bollinger', 20, 2), ('vwap',), ('vwap', 10)]
+
+
+def random_candles(count, seed):
+	rnd = np.random.RandomState(seed)
+	close = 0.05 * np.exp(np.cumsum(rnd.normal(0, 0.002, count)))
+	open_ = np.concatenate(([close[0]], close[:-1]))
+	spread = np.abs(rnd.normal(0, 0.001, count)) * close
+	volume = rnd.exponential(100.0, count)
+	return Candles(np.arange(count, dtype=np.int64) * 60, open_, np.maximum(open_, close) + spread,
+					np.minimum(open_, close) - spread, close, volume, volume * close)
+
+
+def test_mixed_history_lengths():
+	long, short = random_candles(100, 1), random_candles(50, 2)
+	data = stack([long, short])
+	close = data['C']
+
+	for f, alone in ((lambda x: sma(x, 20), sma(short.C, 20)),
+					(lambda x: ema(x, 12), ema(short.C, 12)),
+					(lambda x: rsi(x, 14), rsi(short.C, 14)),
+					(lambda x: bollinger(x, 20)[1], bollinger(short.C, 20)[1])):
+		stacked = f(close)
+		assert np.isnan(stacked[1, :50]).all()
+		np.testing.assert_allclose(stacked[1, 50:], alone, equal_nan=True)
+		assert np.isfinite(stacked[1, -30:]).all()
+		np.testing.assert_allclose(stacked[0], f(long.C), equal_nan=True)
+
+	np.testing.assert_allclose(vwap(data['H'], data['L'], close, data['V'])[1, 50:],
+								vwap(short.H, short.L, short.C, short.V))
+
+
+def test_engine_update_mixed_history_lengths():
+	long, short = random_candles(120, 3), random_candles(60, 4)
+	engine = IndicatorEngine(SPECS)
+	engine.compute(stack([long[:100], short[:40]]))
+
+	for i in range(20):
+		candle = dict((f, np.array([getattr(long, f)[100 + i], getattr(short, f)[40 + i]])) for f in 'HLCV')
+		latest = engine.update(candle)
+
+	expected = IndicatorEngine(SPECS).compute(stack([long, short]))
+	for key, value in latest.items():
+		if isinstance(value, tuple):
+			pairs = zip(value, [band[:, -1] for band in expected[key]])
+		else:
+			pairs = [(value, expected[key][:, -1])]
+		for got, want in pairs:
+			assert np.isfinite(got).all(), key
+			np.testing.assert_allclose(got, want, rtol=1e-9, err_msg=key)
+
+
+def test_engine_seeds_markets_listed_during_updates():
+	long, short = random_candles(140, 5), random_candles(45, 6)
+	engine = IndicatorEngine(SPECS)
+	engine.compute(stack([long[:100], short[:5]]))
+
+	for i in range(40):
+		latest = engine.update(dict((f, np.array([getattr(long, f)[100 + i], getattr(short, f)[5 + i]])) for f in 'HLCV'))
+
+	expected = IndicatorEngine(SPECS).compute(stack([long, short]))
+	for key in ('ema12', 'rsi14', 'sma20'):
+		assert np.isfinite(latest[key]).all(), key
+		np.testing.assert_allclose(latest[key], expected[key][:, -1], rtol=1e-9, err_msg=key)
@@ -0,0 +1,238 @@
+"""Transports carry the requests of the Bittrex client.
+
+RequestsTransport sends them over a requests.Session. ReplayTransport and
+ReplayServer answer them from recorded responses, in-process or over local
+HTTP, so the client can be tested and benchmarked without bittrex.com.
+RecordingTransport records the responses of another transport.
+
+Recordings map a request key (see request_key) to a (status, body) tuple.
+"""
+import io
+import json
+import threading
+import time
+
+from requests.adapters import HTTPAdapter
+
+try:
+	from urllib3.connection import HTTPConnection, HTTPSConnection
+	from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+except ImportError:
+	from requests.packages.urllib3.connection import HTTPConnection, HTTPSConnection
+	from requests.packages.urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+try:
+	from http.server import BaseHTTPRequestHandler, HTTPServer
+	from socketserver import ThreadingMixIn
+	from urllib.parse import urlsplit, parse_qsl, urlencode
+except ImportError:
+	from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+	from SocketServer import ThreadingMixIn
+	from urlparse import urlsplit, parse_qsl
+	from urllib import urlencode
+
+# Query parameters that differ between otherwise identical requests
+VOLATILE = frozenset(['apikey', 'nonce', '_'])
+
+
+def request_key(url):
+	"""Lower cased path plus the sorted, non volatile query parameters of url"""
+	parts = urlsplit(url)
+	query = sorted((k, v) for k, v in parse_qsl(parts.query) if k not in VOLATILE)
+	return parts.path.lower() + ('?' + urlencode(query) if query else '')
+
+
+# Seconds the current thread spent opening connections (DNS, TCP and TLS)
+_connecting = threading.local()
+
+
+class _TimedHTTPConnection(HTTPConnection):
+	def connect(self):
+		start = time.perf_counter()
+		try:
+			super(_TimedHTTPConnection, self).connect()
+		finally:
+			_connecting.seconds = getattr(_connecting, 'seconds', 0.0) + time.perf_counter() - start
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+	def connect(self):
+		start = time.perf_counter()
+		try:
+			super(_TimedHTTPSConnection, self).connect()
+		finally:
+			_connecting.seconds = getattr(_connecting, 'seconds', 0.0) + time.perf_counter() - start
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+	ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+	ConnectionCls = _TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+	"""HTTPAdapter whose connections record how long opening them took"""
+
+	def init_poolmanager(self, *args, **kwargs):
+		super(TimedHTTPAdapter, self).init_poolmanager(*args, **kwargs)
+		self.poolmanager.pool_classes_by_scheme = {	'http': _TimedHTTPConnectionPool,
+													'https': _TimedHTTPSConnectionPool}
+
+
+class Response(object):
+	__slots__ = ('status_code', 'content', 'raw', 'timings')
+
+	def __init__(self, status_code, content):
+		self.status_code = status_code
+		self.content = content
+		self.raw = io.BytesIO(content)
+		self.timings = None
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		pass
+
+
+class RequestsTransport(object):
+	def __init__(self, session, timeout=None):
+		self.session = session
+		self.timeout = timeout
+
+	def get(self, url, headers):
+		"""Response of the request, its timings hold the connect, wait and download seconds.
+
+		Connect time is only measured on sessions using TimedHTTPAdapter,
+		otherwise it is part of the wait time.
+		"""
+		_connecting.seconds = 0.0
+		start = time.perf_counter()
+		r = self.session.get(url, headers=headers, timeout=self.timeout, stream=True)
+		received = time.perf_counter()
+		r.content
+		connect = _connecting.seconds
+		r.timings = {	'connect': connect,
+						'wait': received - start - connect,
+						'download': time.perf_counter() - received}
+		return r
+
+	def stream(self, url, headers):
+		"""A response to use as context manager, its body is read from raw"""
+		r = self.session.get(url, headers=headers, timeout=self.timeout, stream=True)
+		r.raw.decode_content = True
+		return r
+
+	def close(self):
+		self.session.close()
+
+
+class ReplayTransport(object):
+	def __init__(self, recordings):
+		self.recordings = recordings
+
+	def get(self, url, headers):
+		status, body = self.recordings.get(request_key(url), (404, b''))
+		return Response(status, body)
+
+	def stream(self, url, headers):
+		return self.get(url, headers)
+
+	def close(self):
+		pass
+
+
+class RecordingTransport(object):
+	def __init__(self, transport, recordings=None):
+		self.transport = transport
+		self.recordings = recordings if recordings is not None else {}
+
+	def get(self, url, headers):
+		r = self.transport.get(url, headers)
+		self.recordings[request_key(url)] = (r.status_code, r.content)
+		return r
+
+	def stream(self, url, headers):
+		return self.get(url, headers)
+
+	def close(self):
+		self.transport.close()
+
+	def save(self, path):
+		save_recordings(self.recordings, path)
+
+
+def save_recordings(recordings, path):
+	with open(path, 'w') as f:
+		json.dump(dict((k, [s, b.decode('utf-8')]) for k, (s, b) in recordings.items()), f)
+
+
+def load_recordings(path):
+	with open(path) as f:
+		return dict((k, (s, b.encode('utf-8'))) for k, (s, b) in json.load(f).items())
+
+
+class _ReplayHandler(BaseHTTPRequestHandler):
+	protocol_version = 'HTTP/1.1'
+	disable_nagle_algorithm = True
+
+	def do_GET(self):
+		status, body = self.server.recordings.get(request_key(self.path), (404, b''))
+		self.send_response(status)
+		self.send_header('Content-Type', 'application/json')
+		self.send_header('Content-Length', str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def log_message(self, *args):
+		pass
+
+
+class _ThreadingServer(ThreadingMixIn, HTTPServer):
+	daemon_threads = True
+
+
+class ReplayServer(object):
+	"""Local HTTP server answering from recordings, base urls point a client at it:
+
+		with ReplayServer(recordings) as server:
+			client = Bittrex(base=server.base, base_2=server.base_2)
+	"""
+
+	def __init__(self, recordings, host='127.0.0.1', port=0):
+		self.recordings = recordings
+		self._server = _ThreadingServer((host, port), _ReplayHandler)
+		self._server.recordings = recordings
+		self._thread = None
+
+	@property
+	def url(self):
+		return 'http://%s:%d' % self._server.server_address
+
+	@property
+	def base(self):
+		from bittrex import BASE
+		return BASE.replace('https://bittrex.com', self.url)
+
+	@property
+	def base_2(self):
+		from bittrex import BASE_2
+		return BASE_2.replace('https://bittrex.com', self.url)
+
+	def start(self):
+		self._thread = threading.Thread(target=self._server.serve_forever)
+		self._thread.daemon = True
+		self._thread.start()
+		return self
+
+	def stop(self):
+		self._server.shutdown()
+		self._server.server_close()
+
+	def __enter__(self):
+		return self.start()
+
+	def __exit__(self, *exc):
+		self.stop()